@@ -1,18 +1,54 @@
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Literal
+
+import orjson
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, status
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 
 from app.auth.auth_service import AuthService
-from app.payments.payments_service import PayAdmitService
+from app.config.settings import settings
+from app.idempotency.service import IdempotencyService, get_idempotency_service
+from app.payments.bulk_payouts import BulkPayoutService, parse_payouts
+from app.payments.export import (
+    CSV_MEDIA_TYPE,
+    NDJSON_MEDIA_TYPE,
+    csv_rows,
+    ndjson_rows,
+    prefetched,
+)
+from app.payments.pagination import decode_cursor, encode_cursor
+from app.payments.payment_repository import PaymentRepository
+from app.payments.payments_service import PayAdmitService, PayAdmitStatusError
+from app.payments.status_batcher import StatusBatcher, get_status_batcher
+from app.payments.status_broker import (
+    StatusBroker,
+    get_status_broker,
+    status_event_stream,
+)
 from app.payments.schemas import (
     CreatePaymentRequest,
     CreateRefundRequest,
     PaymentConfirmationType,
+    PaymentHistoryPage,
+    PaymentStatusBatchRequest,
+)
+from app.ratelimit.service import (
+    RateLimitedRoute,
+    RateLimiter,
+    enforce_rate_limit,
+    get_rate_limiter,
+    rate_limit,
 )
 from app.users.models import User
 
-router = APIRouter()
+router = APIRouter(route_class=RateLimitedRoute)
 
+IdempotencyKey = Header(None, alias="Idempotency-Key", max_length=255)
+# Операции, двигающие деньги, и чтение ограничиваются раздельными лимитами.
+CreateLimit = Depends(rate_limit("create"))
+ReadLimit = Depends(rate_limit("read"))
 
-@router.get("/payments")
+
+@router.get("/payments", dependencies=[ReadLimit])
 async def get_payments(
     limit: int = 10,
     offset: int = 0,
@@ -33,68 +69,199 @@ async def get_payments(
     - HTTPException: если произошла ошибка при выполнении запроса к API.
     """
     try:
-        return await payadmit_service.get_payments(limit=limit, offset=offset)
+        # Тело ответа PayAdmit отдаётся как есть, без разбора и повторной сериализации.
+        return Response(
+            await payadmit_service.get_payments_raw(limit=limit, offset=offset),
+            media_type="application/json",
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except HTTPException as e:
         raise e
 
 
-@router.post("/payments")
+@router.get("/payments/export", dependencies=[ReadLimit])
+async def export_payments(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    page_size: int = Query(1000, ge=1, le=1000),
+    user: User = Depends(AuthService.get_current_user),
+    payadmit_service: PayAdmitService = Depends(),
+):
+    """
+    Выгружает все платежи из API PayAdmit одним потоком.
+    Страницы запрашиваются на сервере с упреждением, память не зависит от объёма выгрузки.
+    Параметры:
+    - format (str): ndjson (по умолчанию) или csv.
+    - page_size (int): Размер страницы запроса к PayAdmit (по умолчанию 1000).
+    Возвращает:
+    - Поток платежей в формате NDJSON или CSV.
+    Исключения:
+    - HTTPException: если PayAdmit вернул ошибку на первой странице.
+    """
+    pages = await prefetched(payadmit_service.iter_payment_pages(page_size))
+    if format == "csv":
+        return StreamingResponse(
+            csv_rows(pages),
+            media_type=CSV_MEDIA_TYPE,
+            headers={"Content-Disposition": 'attachment; filename="payments.csv"'},
+        )
+    return StreamingResponse(ndjson_rows(pages), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/history", response_model=PaymentHistoryPage, dependencies=[ReadLimit])
+async def get_payment_history(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    user: User = Depends(AuthService.get_current_user),
+    repository: PaymentRepository = Depends(),
+) -> PaymentHistoryPage:
+    """
+    Получает историю платежей текущего пользователя из локальной БД.
+    Параметры:
+    - limit (int): Количество платежей на странице (по умолчанию 20, максимум 100).
+    - cursor (str): Курсор следующей страницы из ответа предыдущего запроса.
+    Возвращает:
+    - Страницу платежей и курсор следующей страницы (null, если страниц больше нет).
+    Исключения:
+    - HTTPException: если курсор некорректен.
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    payments = await repository.get_payments_by_user(user.id, limit + 1, after)
+    next_cursor = None
+    if len(payments) > limit:
+        payments = payments[:limit]
+        next_cursor = encode_cursor(payments[-1].created_at, payments[-1].id)
+    return PaymentHistoryPage(items=payments, next_cursor=next_cursor)
+
+
+@router.post("/payments", dependencies=[CreateLimit])
 async def create_payment(
     request: CreatePaymentRequest,
     user: User = Depends(AuthService.get_current_user),
     payadmit_service: PayAdmitService = Depends(),
+    idempotency: IdempotencyService = Depends(get_idempotency_service),
+    idempotency_key: str | None = IdempotencyKey,
 ):
     """
     Создает новый платеж через API PayAdmit.
     Параметры:
-    - amount (int): сумма платежа.
-    - currency (str): валюта платежа.
+    - amount (Decimal): сумма платежа.
+    - currency (str): валюта платежа (код ISO 4217).
+    - customer: данные клиента; firstName и lastName обязательны.
+    - billingAddress: адрес плательщика (необязательно).
+    - Idempotency-Key (заголовок): повтор с тем же ключом вернёт сохранённый ответ.
     Возвращает:
     - redirect_url для ввода данных и подтверждения платежа.
     Исключения:
     - HTTPException: если произошла ошибка при создании платежа.
     """
     try:
-        return await payadmit_service.create_payment(
-            user,
-            request.amount,
-            request.currency,
-            request.customer,
+        return await idempotency.execute(
+            idempotency_key,
+            f"create_payment:{user.id}",
+            request,
+            lambda: payadmit_service.create_payment(
+                user,
+                request.amount,
+                request.currency,
+                request.customer,
+                request.billingAddress,
+            ),
         )
     except HTTPException as e:
         raise e
 
 
-@router.post("/payouts")
+@router.post("/payouts", dependencies=[CreateLimit])
 async def create_payout(
     request: CreatePaymentRequest,
     user: User = Depends(AuthService.get_current_user),
     payadmit_service: PayAdmitService = Depends(),
+    idempotency: IdempotencyService = Depends(get_idempotency_service),
+    idempotency_key: str | None = IdempotencyKey,
 ):
     """
     Создает новую выплату через API PayAdmit.
     Параметры:
-    - amount (int): сумма выплаты.
-    - currency (str): валюта выплаты.
+    - amount (Decimal): сумма выплаты.
+    - currency (str): валюта выплаты (код ISO 4217).
+    - customer: данные получателя; firstName и lastName обязательны.
+    - billingAddress: адрес получателя (необязательно).
+    - Idempotency-Key (заголовок): повтор с тем же ключом вернёт сохранённый ответ.
     Возвращает:
     - Информацию о созданной выплате.
     Исключения:
     - HTTPException: если произошла ошибка при создании выплаты.
     """
     try:
-        return await payadmit_service.create_payment(
-            user,
-            request.amount,
-            request.currency,
-            request.customer,
+        return await idempotency.execute(
+            idempotency_key,
+            f"create_payout:{user.id}",
+            request,
+            lambda: payadmit_service.create_payout(
+                user,
+                request.amount,
+                request.currency,
+                request.customer,
+                request.billingAddress,
+            ),
         )
     except HTTPException as e:
         raise e
 
 
-@router.post("/payouts/confirm")
+@router.post("/payouts/bulk")
+async def create_payouts_bulk(
+    request: Request,
+    user: User = Depends(AuthService.get_current_user),
+    bulk_service: BulkPayoutService = Depends(),
+    limiter: RateLimiter = Depends(get_rate_limiter),
+    idempotency: IdempotencyService = Depends(get_idempotency_service),
+    idempotency_key: str | None = IdempotencyKey,
+):
+    """
+    Создает пакет выплат через API PayAdmit.
+    Параметры:
+    - Тело запроса: JSON-массив выплат или NDJSON (Content-Type: application/x-ndjson),
+      каждая выплата в формате запроса /payouts.
+    - Idempotency-Key (заголовок): повтор пакета с тем же ключом получает
+      сохранённые результаты без повторной отправки выплат.
+    Возвращает:
+    - NDJSON: по строке на выплату в порядке завершения, с полем index —
+      позицией выплаты в пакете. Без Idempotency-Key строки отдаются потоком
+      по мере готовности, с ключом — одним ответом после всего пакета.
+    Исключения:
+    - HTTPException: если хотя бы одна выплата в пакете некорректна (пакет не отправляется)
+      или пакет превышает лимит выплат пользователя (RATE_LIMIT.rules["bulk"]):
+      413, если пакет больше, чем лимит пропускает за раз, иначе 429.
+    """
+    payouts = parse_payouts(
+        await request.body(), request.headers.get("content-type", "")
+    )
+    # Лимит bulk списывается по выплате, а не по запросу.
+    await enforce_rate_limit(request, limiter, user, "bulk", len(payouts.root))
+    if idempotency_key is None:
+        return StreamingResponse(
+            bulk_service.stream(user, payouts.root), media_type=NDJSON_MEDIA_TYPE
+        )
+    results = await idempotency.execute(
+        idempotency_key,
+        f"create_payouts_bulk:{user.id}",
+        payouts,
+        lambda: bulk_service.collect(user, payouts.root),
+        lock_ttl=settings.BULK_PAYOUTS.idempotency_lock_ttl,
+    )
+    return Response(
+        b"".join(orjson.dumps(result) + b"\n" for result in results),
+        media_type=NDJSON_MEDIA_TYPE,
+    )
+
+
+@router.post("/payouts/confirm", dependencies=[CreateLimit])
 async def confirm_payout(
     request: PaymentConfirmationType,
     user: User = Depends(AuthService.get_current_user),
@@ -115,52 +282,123 @@ async def confirm_payout(
         raise e
 
 
-@router.post("/payments/refund")
+@router.post("/payments/refund", dependencies=[CreateLimit])
 async def create_refund(
     request: CreateRefundRequest,
     user: User = Depends(AuthService.get_current_user),
     payadmit_service: PayAdmitService = Depends(),
+    idempotency: IdempotencyService = Depends(get_idempotency_service),
+    idempotency_key: str | None = IdempotencyKey,
 ):
     """
     Создает возврат средств для конкретного платежа через API PayAdmit.
     Параметры:
     - payment_id (int): идентификатор платежа для возврата.
+    - Idempotency-Key (заголовок): повтор с тем же ключом вернёт сохранённый ответ.
     Возвращает:
     - Информацию о возврате средств.
     Исключения:
     - HTTPException: если произошла ошибка при создании возврата.
     """
     try:
-        return await payadmit_service.create_refund(
-            user, request.amount, request.currency, request.parentPaymentId
+        return await idempotency.execute(
+            idempotency_key,
+            f"create_refund:{user.id}",
+            request,
+            lambda: payadmit_service.create_refund(
+                user, request.amount, request.currency, request.parentPaymentId
+            ),
         )
     except HTTPException as e:
         raise e
 
 
-@router.get("/payments/status")
+@router.get("/payments/status", dependencies=[ReadLimit])
 async def check_status(
     payment_id: str,
     user: User = Depends(AuthService.get_current_user),
-    payadmit_service: PayAdmitService = Depends(),
+    batcher: StatusBatcher = Depends(get_status_batcher),
 ):
     """
     Проверяет статус конкретного платежа через API PayAdmit.
+    Ответ кэшируется на несколько секунд и сбрасывается при получении вебхука.
+    Платежи в терминальном статусе отдаются из локальной БД без обращения к PayAdmit.
+    Одновременные запросы статуса объединяются в пачки, повторы одного платежа — в один вызов.
     Параметры:
     - payment_id (int): идентификатор платежа для проверки статуса.
     Возвращает:
-    - Информацию о текущем статусе платежа.
+    - Информацию о текущем статусе платежа или тело ответа PayAdmit с ошибкой.
     Исключения:
-    - HTTPException: если произошла ошибка при проверке статуса.
+    - HTTPException: если PayAdmit недоступен.
     """
-    print(payment_id)
     try:
-        return await payadmit_service.check_status(payment_id)
+        return ORJSONResponse(await batcher.get(payment_id))
+    except PayAdmitStatusError as e:
+        return ORJSONResponse(e.body)
     except HTTPException as e:
         raise e
 
 
-@router.get("/operations")
+@router.post("/payments/status/batch", dependencies=[ReadLimit])
+async def check_statuses(
+    request: PaymentStatusBatchRequest,
+    user: User = Depends(AuthService.get_current_user),
+    batcher: StatusBatcher = Depends(get_status_batcher),
+):
+    """
+    Проверяет статусы нескольких платежей одним запросом.
+    Параметры:
+    - payment_ids (list[str]): идентификаторы платежей в PayAdmit
+      (не больше STATUS_BATCH__MAX_IDS, повторы учитываются один раз).
+    Возвращает:
+    - results: по элементу на платеж в порядке запроса — {"payment_id", "data"}
+      с ответом как у /payments/status или {"payment_id", "error"}
+      с status_code и detail, если статус этого платежа получить не удалось.
+    Исключения:
+    - HTTPException: если в запросе слишком много платежей.
+    """
+    max_ids = settings.STATUS_BATCH.max_ids
+    if len(request.payment_ids) > max_ids:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"В запросе больше {max_ids} платежей",
+        )
+    results = []
+    for payment_id, result in (await batcher.get_many(request.payment_ids)).items():
+        if isinstance(result, HTTPException):
+            error = {"status_code": result.status_code, "detail": result.detail}
+        elif isinstance(result, Exception):
+            error = {"status_code": 500, "detail": "Ошибка при проверке статуса"}
+        else:
+            results.append({"payment_id": payment_id, "data": result})
+            continue
+        results.append({"payment_id": payment_id, "error": error})
+    return ORJSONResponse({"results": results})
+
+
+@router.get("/payments/status/stream", dependencies=[ReadLimit])
+async def stream_status(
+    payment_id: str,
+    user: User = Depends(AuthService.get_current_user),
+    broker: StatusBroker = Depends(get_status_broker),
+):
+    """
+    Подписка на изменения статуса платежа (Server-Sent Events) вместо опроса /payments/status.
+    Статусы приходят из вебхуков PayAdmit, PayAdmit при этом не опрашивается.
+    Параметры:
+    - payment_id (str): идентификатор платежа в PayAdmit.
+    Возвращает:
+    - Поток событий status с полями payment_id и state; поток закрывается
+      после терминального статуса.
+    """
+    return StreamingResponse(
+        status_event_stream(broker, payment_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/operations", dependencies=[ReadLimit])
 async def get_operations(
     payment_id: str,
     user: User = Depends(AuthService.get_current_user),
@@ -174,12 +412,12 @@ async def get_operations(
     - HTTPException: если произошла ошибка при получении списка операций.
     """
     try:
-        return await payadmit_service.get_operations(payment_id)
+        return ORJSONResponse(await payadmit_service.get_operations(payment_id))
     except HTTPException as e:
         raise e
 
 
-@router.get("/balance")
+@router.get("/balance", dependencies=[ReadLimit])
 async def get_balance(
     user: User = Depends(AuthService.get_current_user),
     payadmit_service: PayAdmitService = Depends(),
@@ -192,6 +430,6 @@ async def get_balance(
     - HTTPException: если произошла ошибка при получении баланса.
     """
     try:
-        return await payadmit_service.get_balance(user)
+        return ORJSONResponse(await payadmit_service.get_balance())
     except HTTPException as e:
         raise e
@@ -1,87 +1,82 @@
-from fastapi import APIRouter, Request, HTTPException
-
-# import hmac
-# import hashlib
 import logging
 
-# from app.config.settings import settings
+from fastapi import APIRouter, Depends, HTTPException
 
+from app.payments.cache import ResponseCache, get_payadmit_cache
+from app.payments.status_broker import StatusBroker, StatusEvent, get_status_broker
+from app.tasks.queue import TaskPublishError, TaskQueue, get_task_queue
+from app.webhooks.ingestion import StatusUpdate, WebhookIngestor, get_webhook_ingestor
+from app.webhooks.signature import VerifiedWebhook, verified_webhook_payload
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
 @router.post("/payment_status")
-async def payment_status_webhook(request: Request):
+async def payment_status_webhook(
+    webhook: VerifiedWebhook = Depends(verified_webhook_payload),
+    ingestor: WebhookIngestor = Depends(get_webhook_ingestor),
+    cache: ResponseCache = Depends(get_payadmit_cache),
+    broker: StatusBroker = Depends(get_status_broker),
+    task_queue: TaskQueue = Depends(get_task_queue),
+):
     """
     Эндпоинт для обработки вебхуков от PayAdmit.
+    Запросы с неверной подписью отклоняются ещё в verified_webhook_payload.
+    Статус платежа ставится в очередь и записывается в БД пакетами.
+    Повторные доставки того же события подтверждаются без повторной обработки.
+    Новый статус публикуется подписчикам /payments/payments/status/stream.
+    Уведомление пользователя о неуспешном платеже ставится в очередь задач.
     """
     try:
-        data = await request.json()
-        logger.info(f"Received webhook data: {data}")
-
+        data = webhook.data
         payment_id = data.get("id")
         state = data.get("state")
-        payment_type = data.get("paymentType")
-        amount = data.get("amount")
-        currency = data.get("currency")
-        error_code = data.get("errorCode")
-
+        if payment_id and state:
+            update = StatusUpdate(
+                external_id=str(payment_id), status=state, digest=webhook.digest
+            )
+            if not await ingestor.submit(update):
+                return {"message": "Webhook already processed"}
+            await cache.invalidate_payment(update.external_id)
+            await broker.publish(StatusEvent(update.external_id, update.status))
+
+        # Полное тело пишется только на уровне DEBUG, данные клиента маскируются.
+        logger.debug("Webhook payload", extra={"payload": data})
         logger.info(
-            f"Payment ID: {payment_id}, State: {state}, Payment Type: {payment_type}, "
-            f"Amount: {amount} {currency}, Error Code: {error_code}"
+            "Webhook received",
+            extra={
+                "payment_id": payment_id,
+                "state": state,
+                "payment_type": data.get("paymentType"),
+                "amount": data.get("amount"),
+                "currency": data.get("currency"),
+                "error_code": data.get("errorCode"),
+            },
         )
 
         if state == "COMPLETED":
-            logger.info(f"Payment {payment_id} completed successfully")
-            # Обновить статус платежа в БД
-            # Например: update_payment_status(payment_id, "COMPLETED")
+            logger.info("Payment %s completed successfully", payment_id)
         elif state == "FAILED" or state == "DECLINED":
-            logger.warning(f"Payment {payment_id} failed or declined")
-            # Уведомить пользователя о сбое
-            # Например: notify_user(payment_id, "FAILED")
+            logger.warning("Payment %s failed or declined", payment_id)
+            try:
+                await task_queue.publish(
+                    "notify_user", [{"payment_id": str(payment_id), "state": state}]
+                )
+            except TaskPublishError:
+                logger.warning(
+                    "Failed to queue notification for payment %s",
+                    payment_id,
+                    exc_info=True,
+                )
         else:
-            logger.info(f"Payment {payment_id} has status: {state}")
+            logger.info("Payment %s has status: %s", payment_id, state)
 
         return {"message": "Webhook processed successfully"}
 
-    except Exception as e:
-        logger.error(f"Error processing webhook: {str(e)}")
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error processing webhook")
         raise HTTPException(status_code=500, detail="Internal server error")
-
-
-# @router.post("/payment_state")
-# async def payment_state_webhook(request: Request):
-#     signature = request.headers.get("Signature")
-#     body = await request.body()
-
-#     # Верификация подписи
-#     expected_signature = hmac.new(
-#         key=settings.PAYADMIT_SIGN_KEY.encode(), msg=body, digestmod=hashlib.sha256
-#     ).hexdigest()
-
-#     if signature != expected_signature:
-#         return {"error": "Invalid signature"}, 400
-
-
-#     data = await request.json()
-#     payment_id = data.get("payment_id")
-#     state = data.get("state")
-#     print(f"{payment_id=}\n{state=}")
-#     print(data)
-
-#     if state == "COMPLETED":
-#         # Обновить статус платежа в БД
-#         # Например, обновить запись в базе данных
-#         pass
-#     elif state == "DECLINED":
-#         # Уведомить пользователя о сбое
-#         # Например, отправить email или уведомление
-#         pass
-
-#     return {"message": "Webhook processed successfully"}
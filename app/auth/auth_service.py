@@ -3,7 +3,8 @@ from fastapi.security import OAuth2PasswordBearer
 import jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.auth.jwt_manager import JWTManager
-from app.db.database import get_db
+from app.auth.token_cache import token_cache
+from app.db.database import get_db, release_connection
 from app.users.user_service import UserService
 from app.users.schemas import UserOut
 
@@ -35,7 +36,14 @@ class AuthService:
         token: str = Depends(oauth2_scheme),
         session: AsyncSession = Depends(get_db),
     ) -> UserOut:
-        """Получает текущего пользователя из JWT-токена."""
+        """
+        Получает текущего пользователя из JWT-токена.
+        Повторные запросы с тем же токеном обслуживаются из token_cache
+        без проверки подписи и обращения к БД.
+        """
+        cached = token_cache.get(token)
+        if cached is not None:
+            return cached.user
         jwt_manager = JWTManager()
         try:
             payload = jwt_manager.decode_token(token)
@@ -51,6 +59,9 @@ class AuthService:
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Пользователь не найден",
                 )
+            user = UserOut.model_validate(user)
+            await release_connection(session)
+            token_cache.set(token, payload, user)
             return user
         except jwt.ExpiredSignatureError:
             raise HTTPException(status_code=401, detail="Токен истёк")
@@ -1,12 +1,12 @@
 import jwt
 from datetime import datetime, timedelta, timezone
+from app.auth.key_store import KeyStore, key_store
 from app.config.settings import settings
 
 
 class JWTManager:
-    def __init__(self):
-        self.private_key = settings.AUTH_JWT.private_key_path.read_text()
-        self.public_key = settings.AUTH_JWT.public_key_path.read_text()
+    def __init__(self, keys: KeyStore = key_store):
+        self.keys = keys
         self.algorithm = settings.AUTH_JWT.algorithm
         self.token_expiry = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
 
@@ -17,8 +17,18 @@ class JWTManager:
             "exp": datetime.now(timezone.utc) + self.token_expiry,
             "iat": datetime.now(timezone.utc),
         }
-        return jwt.encode(payload, self.private_key, algorithm=self.algorithm)
+        key_set = self.keys.keys
+        return jwt.encode(
+            payload,
+            key_set.signing_key,
+            algorithm=self.algorithm,
+            headers={"kid": key_set.signing_kid},
+        )
 
     def decode_token(self, token: str) -> dict:
         """Декодирует и валидирует JWT-токен."""
-        return jwt.decode(token, self.public_key, algorithms=[self.algorithm])
+        kid = jwt.get_unverified_header(token).get("kid")
+        public_key = self.keys.get_public_key(kid)
+        if public_key is None:
+            raise jwt.InvalidTokenError("Неизвестный ключ подписи")
+        return jwt.decode(token, public_key, algorithms=[self.algorithm])
@@ -0,0 +1,81 @@
+import hashlib
+import threading
+from dataclasses import dataclass, field
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.types import (
+    PrivateKeyTypes,
+    PublicKeyTypes,
+)
+
+from app.config.settings import AuthJWT, settings
+
+
+def key_id(public_key: PublicKeyTypes) -> str:
+    """Идентификатор ключа (kid): отпечаток SHA-256 от DER-представления открытого ключа."""
+    der = public_key.public_bytes(
+        encoding=serialization.Encoding.DER,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    return hashlib.sha256(der).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class KeySet:
+    """Неизменяемый набор разобранных ключей, подменяется целиком при перезагрузке."""
+
+    signing_key: PrivateKeyTypes
+    signing_kid: str
+    public_keys: dict[str, PublicKeyTypes] = field(default_factory=dict)
+
+
+class KeyStore:
+    """
+    Общее для процесса хранилище JWT-ключей.
+    PEM-файлы читаются и разбираются один раз; для ротации можно указать
+    несколько открытых ключей, а нужный выбирается по заголовку kid токена.
+    """
+
+    def __init__(self, config: AuthJWT):
+        self.config = config
+        self._lock = threading.Lock()
+        self._keys: KeySet | None = None
+
+    def _load(self) -> KeySet:
+        signing_key = serialization.load_pem_private_key(
+            self.config.private_key_path.read_bytes(), password=None
+        )
+        public_keys = {}
+        for path in [self.config.public_key_path, *self.config.extra_public_key_paths]:
+            public_key = serialization.load_pem_public_key(path.read_bytes())
+            public_keys[key_id(public_key)] = public_key
+        signing_kid = key_id(signing_key.public_key())
+        public_keys.setdefault(signing_kid, signing_key.public_key())
+        return KeySet(
+            signing_key=signing_key, signing_kid=signing_kid, public_keys=public_keys
+        )
+
+    @property
+    def keys(self) -> KeySet:
+        if self._keys is None:
+            with self._lock:
+                if self._keys is None:
+                    self._keys = self._load()
+        return self._keys
+
+    def reload(self) -> None:
+        """Перечитывает ключи с диска, например после ротации."""
+        keys = self._load()
+        with self._lock:
+            self._keys = keys
+
+    def get_public_key(self, kid: str | None) -> PublicKeyTypes | None:
+        """
+        Возвращает открытый ключ по kid.
+        Токены без kid (выпущенные до ротации) проверяются ключом текущей подписи.
+        """
+        keys = self.keys
+        return keys.public_keys.get(kid or keys.signing_kid)
+
+
+key_store = KeyStore(settings.AUTH_JWT)
@@ -0,0 +1,86 @@
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from prometheus_client import Counter
+
+from app.config.settings import TokenCacheSettings, settings
+from app.users.schemas import UserOut
+
+TOKEN_CACHE_LOOKUPS = Counter(
+    "auth_token_cache_lookups_total",
+    "Обращения к кэшу проверенных JWT-токенов",
+    ["result"],
+)
+
+
+@dataclass(slots=True)
+class CachedToken:
+    claims: dict
+    user: UserOut
+    expires_at: float
+
+
+class TokenCache:
+    """
+    Ограниченный LRU-кэш уже проверенных bearer-токенов.
+    Ключ — SHA-256 от токена, значение — claims и найденный пользователь.
+    Запись живёт до exp токена, но не дольше max_ttl: инвалидация работает
+    только внутри процесса, поэтому другие воркеры узнают об удалении
+    пользователя не позже чем через max_ttl секунд.
+    """
+
+    def __init__(self, config: TokenCacheSettings):
+        self.config = config
+        self._entries: OrderedDict[bytes, CachedToken] = OrderedDict()
+        self._by_user: dict[int, set[bytes]] = {}
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> CachedToken | None:
+        if not self.config.enabled:
+            return None
+        digest = self._digest(token)
+        entry = self._entries.get(digest)
+        if entry is None:
+            TOKEN_CACHE_LOOKUPS.labels("miss").inc()
+            return None
+        if entry.expires_at <= time.time():
+            self._remove(digest)
+            TOKEN_CACHE_LOOKUPS.labels("expired").inc()
+            return None
+        self._entries.move_to_end(digest)
+        TOKEN_CACHE_LOOKUPS.labels("hit").inc()
+        return entry
+
+    def set(self, token: str, claims: dict, user: UserOut) -> None:
+        if not self.config.enabled:
+            return
+        expires_at = min(claims["exp"], time.time() + self.config.max_ttl)
+        digest = self._digest(token)
+        self._entries[digest] = CachedToken(claims, user, expires_at)
+        self._entries.move_to_end(digest)
+        self._by_user.setdefault(user.id, set()).add(digest)
+        while len(self._entries) > self.config.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Удаляет из кэша все токены пользователя."""
+        for digest in self._by_user.pop(user_id, set()):
+            self._entries.pop(digest, None)
+
+    def _remove(self, digest: bytes) -> None:
+        entry = self._entries.pop(digest, None)
+        if entry is None:
+            return
+        digests = self._by_user.get(entry.user.id)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._by_user[entry.user.id]
+
+
+token_cache = TokenCache(settings.TOKEN_CACHE)
@@ -1,5 +1,6 @@
 from pathlib import Path
-from pydantic import BaseModel
+from typing import Literal
+from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings
 
 
@@ -9,9 +10,277 @@ BASE_DIR = Path(__file__).parent.parent.parent
 class AuthJWT(BaseModel):
     private_key_path: Path = BASE_DIR / "keys" / "jwt-private.pem"
     public_key_path: Path = BASE_DIR / "keys" / "jwt-public.pem"
+    # Открытые ключи, которые продолжают приниматься после ротации.
+    extra_public_key_paths: list[Path] = []
     algorithm: str = "RS256"
 
 
+class TokenCacheSettings(BaseModel):
+    """Кэш проверенных JWT-токенов."""
+
+    enabled: bool = True
+    max_size: int = 10_000
+    max_ttl: float = 300.0
+
+
+class PasswordHashingSettings(BaseModel):
+    """Пул воркеров для bcrypt."""
+
+    bcrypt_rounds: int = 12
+    max_workers: int = 4
+    max_queue: int = 64
+    use_processes: bool = False
+    rehash_on_login: bool = True
+
+
+class DBPool(BaseModel):
+    """Пул соединений к PostgreSQL (на один воркер)."""
+
+    pool_size: int = 10
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    statement_cache_size: int = 100
+    statement_timeout_ms: int = 30_000
+
+
+class WebhookSettings(BaseModel):
+    """Приём вебхуков PayAdmit и пакетная запись статусов в БД."""
+
+    verify_signature: bool = True
+    queue_size: int = 10_000
+    batch_size: int = 500
+    flush_interval: float = 0.05
+    enqueue_timeout: float = 1.0
+    flush_retries: int = 3
+    # Сколько раз не записанная пачка возвращается в очередь, прежде чем события теряются.
+    requeue_limit: int = 5
+    dedup_cache_size: int = 100_000
+    shutdown_timeout: float = 10.0
+
+
+class IdempotencySettings(BaseModel):
+    """Хранилище ответов для заголовка Idempotency-Key."""
+
+    # auto: Redis, если задан REDIS_HOST, иначе Postgres.
+    backend: Literal["auto", "memory", "postgres", "redis"] = "auto"
+    ttl: int = 24 * 60 * 60
+    lock_ttl: int = 60
+    # Сколько ключ остаётся занятым, если неизвестно, выполнил ли PayAdmit
+    # операцию (таймаут, обрыв соединения, 5xx): повтор получает 409, а не дубль.
+    unknown_outcome_ttl: int = 24 * 60 * 60
+
+
+class PayAdmitCacheSettings(BaseModel):
+    """Кэш ответов PayAdmit для частых опросов."""
+
+    enabled: bool = True
+    max_size: int = 10_000
+    # Использовать Redis как общий уровень кэша, если задан REDIS_HOST.
+    use_redis: bool = True
+    # TTL по операциям PayAdmitService, в секундах.
+    ttls: dict[str, float] = {
+        "check_status": 2.0,
+        "get_operations": 5.0,
+        "get_balance": 10.0,
+    }
+
+
+class PayAdmitHTTP(BaseModel):
+    """Параметры пула HTTP-соединений к API PayAdmit."""
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    connect_timeout: float = 5.0
+    read_timeout: float = 15.0
+    write_timeout: float = 15.0
+    pool_timeout: float = 5.0
+    # Таймауты чтения для отдельных операций PayAdmitService, в секундах.
+    operation_timeouts: dict[str, float] = {
+        "get_payments": 30.0,
+        "get_operations": 20.0,
+        "check_status": 5.0,
+        "get_balance": 5.0,
+    }
+
+
+class PayAdmitResilience(BaseModel):
+    """Изоляция и повторы вызовов PayAdmit."""
+
+    # Максимум одновременных вызовов по операциям PayAdmitService (bulkhead).
+    bulkheads: dict[str, int] = {
+        "get_payments": 10,
+        "get_operations": 20,
+        "check_status": 50,
+        "get_balance": 20,
+        "create_payment": 50,
+        "create_payout": 20,
+        "confirm_payout": 20,
+        "create_refund": 20,
+    }
+    default_bulkhead: int = 20
+    # Сколько ждать свободного места в bulkhead перед отказом 503, в секундах.
+    bulkhead_wait: float = 0.5
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout: float = 30.0
+    breaker_half_open_probes: int = 1
+    # Попытки (включая первую) для идемпотентных GET-запросов.
+    retry_attempts: int = 3
+    retry_base_delay: float = 0.1
+    retry_max_delay: float = 2.0
+    # Общий бюджет времени на вызов PayAdmit вместе с повторами, в секундах.
+    request_budget: float = 30.0
+
+
+class PayAdmitGovernorSettings(BaseModel):
+    """Общий для всех воркеров лимит частоты запросов к PayAdmit (квота аккаунта)."""
+
+    enabled: bool = True
+    # Делить квоту между воркерами через Redis, если задан REDIS_HOST.
+    use_redis: bool = True
+    # Квота аккаунта PayAdmit, запросов в секунду; текущий лимит её не превышает.
+    max_rate: float = 50.0
+    min_rate: float = 1.0
+    # AIMD: лимит растёт на increase_per_second в секунду без ответов 429
+    # и умножается на decrease_factor при 429 (не чаще раза в decrease_cooldown).
+    increase_per_second: float = 1.0
+    decrease_factor: float = Field(0.5, gt=0, lt=1)
+    decrease_cooldown: float = 1.0
+    # Доля квоты, которую могут занять только операции с деньгами.
+    priority_reserve: float = Field(0.2, ge=0, lt=1)
+    priority_operations: set[str] = {
+        "create_payment",
+        "create_payout",
+        "confirm_payout",
+        "create_refund",
+    }
+    # Сколько вызов ждёт разрешения, прежде чем получить 503, в секундах.
+    max_wait: float = 2.0
+    # Верхняя граница паузы по заголовку Retry-After, в секундах.
+    max_pause: float = 60.0
+
+
+class BulkPayoutSettings(BaseModel):
+    """Пакетная отправка выплат."""
+
+    max_items: int = 10_000
+    # Одновременных вызовов PayAdmit на один пакет.
+    concurrency: int = 10
+    # Размер пачки при записи выплат в таблицу payments.
+    insert_batch_size: int = 200
+    # На сколько секунд Idempotency-Key пакета занимается до его завершения.
+    idempotency_lock_ttl: int = 30 * 60
+
+
+class ReconcilerSettings(BaseModel):
+    """Сверка незавершённых платежей с PayAdmit."""
+
+    # Запускать сверку фоновой задачей в процессе приложения.
+    enabled: bool = False
+    interval: float = 300.0
+    # Сверяются платежи старше min_age секунд: свежим ещё может прийти вебхук.
+    min_age: float = 600.0
+    batch_size: int = 500
+    max_payments_per_run: int = 50_000
+    concurrency: int = 10
+    # Не больше стольких запросов статуса к PayAdmit в секунду.
+    rate_limit: float = 20.0
+
+
+class StatusStreamSettings(BaseModel):
+    """Подписка клиентов на изменения статуса платежа (Server-Sent Events)."""
+
+    # Раздавать события между воркерами через Redis pub/sub, если задан REDIS_HOST.
+    use_redis: bool = True
+    keepalive: float = 15.0
+    # После этого времени поток закрывается, и клиент переподключается.
+    max_duration: float = 3600.0
+    queue_size: int = 16
+
+
+class RateLimitRule(BaseModel):
+    # Запросов за period секунд; burst — сколько запросов можно сделать подряд
+    # (по умолчанию limit).
+    limit: int
+    period: float = 60.0
+    burst: int | None = None
+
+
+class RateLimitSettings(BaseModel):
+    """Ограничение частоты запросов пользователя к эндпоинтам платежей."""
+
+    enabled: bool = True
+    # GCRA в Redis, общий для всех воркеров, если задан REDIS_HOST;
+    # иначе — скользящее окно в памяти каждого воркера.
+    use_redis: bool = True
+    # Лимиты по классу операции: create — операции с деньгами, read — чтение,
+    # bulk — выплаты в пакетах, где каждая выплата занимает единицу лимита.
+    rules: dict[str, RateLimitRule] = {
+        "create": RateLimitRule(limit=30),
+        "read": RateLimitRule(limit=300),
+        "bulk": RateLimitRule(limit=10_000, period=3600.0),
+    }
+    # Индивидуальные лимиты: {ID пользователя: {класс операции: правило}}.
+    user_rules: dict[int, dict[str, RateLimitRule]] = {}
+
+
+class TaskQueueSettings(BaseModel):
+    """Очередь фоновых задач: запись статусов из вебхуков и уведомления."""
+
+    # memory — задачи выполняются в том же процессе (разработка и тесты),
+    # amqp — публикуются в RabbitMQ и выполняются воркером app.tasks.worker.
+    backend: Literal["memory", "amqp"] = "memory"
+    queue_name: str = "payment_platform.tasks"
+    # Сколько неподтверждённых сообщений RabbitMQ отдаёт одному воркеру;
+    # должно быть не меньше batch_size, иначе пачки не наберутся.
+    prefetch_count: int = 500
+    batch_size: int = 200
+    flush_interval: float = 0.5
+    publish_timeout: float = 5.0
+    # Размер очереди в памяти для backend=memory.
+    memory_queue_size: int = 10_000
+
+
+class StatusBatchSettings(BaseModel):
+    """Объединение одновременных запросов статуса платежей."""
+
+    # Сколько собирать запросы статуса в одну пачку, в секундах.
+    window: float = 0.005
+    # Пачка отправляется сразу, набрав столько разных платежей.
+    max_batch: int = 200
+    # Одновременные запросы к PayAdmit при разборе одной пачки.
+    concurrency: int = 20
+    # Максимум ID в одном запросе /payments/status/batch.
+    max_ids: int = 100
+
+
+class LoggingSettings(BaseModel):
+    """Логирование в JSON через фоновую очередь."""
+
+    level: str = "INFO"
+    queue_size: int = 10_000
+    # Доля записей уровня INFO и ниже, которые пишутся для указанных логгеров.
+    sample_rates: dict[str, float] = {"app.api.webhooks": 0.1}
+    # Ключи, значения которых заменяются на "***" на любой глубине вложенности.
+    redact_fields: set[str] = {
+        "customer",
+        "billingAddress",
+        "paymentMethodDetails",
+        "customerAccountNumber",
+        "cardholderName",
+        "cardNumber",
+        "cvv",
+        "email",
+        "phone",
+        "ip",
+        "password",
+        "recurringToken",
+    }
+
+
 class Settings(BaseSettings):
     PAYADMIT_API_URL: str
     PAYADMIT_SIGN_KEY: str
@@ -24,18 +293,41 @@ class Settings(BaseSettings):
     DB_PASS: str
     DB_NAME: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
-    REDIS_HOST: str
-    REDIS_PORT: int
-    RABBITMQ_HOST: str
-    RABBITMQ_PORT: int
+    REDIS_HOST: str | None = None
+    REDIS_PORT: int = 6379
+    RABBITMQ_HOST: str | None = None
+    RABBITMQ_PORT: int = 5672
+    RABBITMQ_USER: str = "guest"
+    RABBITMQ_PASS: str = "guest"
     AUTH_JWT: AuthJWT = AuthJWT()
+    DB_POOL: DBPool = DBPool()
+    TOKEN_CACHE: TokenCacheSettings = TokenCacheSettings()
+    PASSWORD_HASHING: PasswordHashingSettings = PasswordHashingSettings()
+    PAYADMIT_HTTP: PayAdmitHTTP = PayAdmitHTTP()
+    PAYADMIT_RESILIENCE: PayAdmitResilience = PayAdmitResilience()
+    PAYADMIT_GOVERNOR: PayAdmitGovernorSettings = PayAdmitGovernorSettings()
+    BULK_PAYOUTS: BulkPayoutSettings = BulkPayoutSettings()
+    RECONCILER: ReconcilerSettings = ReconcilerSettings()
+    STATUS_STREAM: StatusStreamSettings = StatusStreamSettings()
+    STATUS_BATCH: StatusBatchSettings = StatusBatchSettings()
+    LOGGING: LoggingSettings = LoggingSettings()
+    TASKS: TaskQueueSettings = TaskQueueSettings()
+    RATE_LIMIT: RateLimitSettings = RateLimitSettings()
+    PAYADMIT_CACHE: PayAdmitCacheSettings = PayAdmitCacheSettings()
+    WEBHOOKS: WebhookSettings = WebhookSettings()
+    IDEMPOTENCY: IdempotencySettings = IdempotencySettings()
 
     @property
     def DATABASE_URL(self):
         return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    @property
+    def AMQP_URL(self):
+        return f"amqp://{self.RABBITMQ_USER}:{self.RABBITMQ_PASS}@{self.RABBITMQ_HOST}:{self.RABBITMQ_PORT}/"
+
     class Config:
         env_file = ".env"
+        env_nested_delimiter = "__"
 
 
 settings = Settings()
@@ -1,20 +1,77 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from fastapi import HTTPException, status
+from prometheus_client import Gauge, Histogram
 
 from app.config.settings import settings
+from app.observability.phases import record_phase
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Время ожидания соединения из пула БД",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections", "Соединения БД, выданные из пула"
+)
+DB_POOL_OPEN = Gauge("db_pool_open_connections", "Открытые соединения пула БД")
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, замеряющий время ожидания свободного соединения."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
 
 
-engine = create_async_engine(settings.DATABASE_URL)
+engine = create_async_engine(
+    settings.DATABASE_URL,
+    poolclass=InstrumentedAsyncQueuePool,
+    pool_size=settings.DB_POOL.pool_size,
+    max_overflow=settings.DB_POOL.max_overflow,
+    pool_timeout=settings.DB_POOL.pool_timeout,
+    pool_recycle=settings.DB_POOL.pool_recycle,
+    pool_pre_ping=settings.DB_POOL.pool_pre_ping,
+    connect_args={
+        "prepared_statement_cache_size": settings.DB_POOL.statement_cache_size,
+        "server_settings": {
+            "statement_timeout": str(settings.DB_POOL.statement_timeout_ms)
+        },
+    },
+)
+DB_POOL_CHECKED_OUT.set_function(lambda: engine.pool.checkedout())
+DB_POOL_OPEN.set_function(lambda: engine.pool.size() + engine.pool.overflow())
 
 
-async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    # Время запросов учитывается в фазе db текущего HTTP-запроса.
+    record_phase("db", time.perf_counter() - context._query_started)
+
+
+async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
 async def get_db():
-    "Dependency to get database session"
+    """
+    Dependency to get database session.
+    Соединение берётся из пула только при первом запросе к БД,
+    поэтому эндпоинты, не обращающиеся к БД, пул не занимают.
+    """
     async with async_session() as session:
         try:
             yield session
@@ -28,5 +85,16 @@ async def get_db():
             await session.close()
 
 
+async def release_connection(session: AsyncSession) -> None:
+    """
+    Завершает читающую транзакцию и возвращает соединение в пул,
+    не дожидаясь конца запроса (например, перед долгим вызовом PayAdmit).
+    """
+    if session.in_transaction() and not (
+        session.new or session.dirty or session.deleted
+    ):
+        await session.rollback()
+
+
 class Base(DeclarativeBase):
     pass
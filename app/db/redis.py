@@ -0,0 +1,16 @@
+from fastapi import Request
+from redis.asyncio import Redis
+
+from app.config.settings import settings
+
+
+def create_redis() -> Redis | None:
+    """Создаёт клиент Redis, если задан REDIS_HOST; иначе компоненты используют локальные хранилища."""
+    if not settings.REDIS_HOST:
+        return None
+    return Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+
+
+def get_redis(request: Request) -> Redis | None:
+    """Dependency, возвращающая общий клиент Redis из состояния приложения."""
+    return request.app.state.redis
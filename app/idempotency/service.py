@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable
+
+from fastapi import HTTPException, Request, status
+from prometheus_client import Counter
+from pydantic import BaseModel, ValidationError
+from redis.asyncio import Redis
+
+from app.config.settings import settings
+from app.db.database import async_session
+from app.idempotency.stores import (
+    IdempotencyStore,
+    MemoryIdempotencyStore,
+    PostgresIdempotencyStore,
+    RedisIdempotencyStore,
+)
+from app.payments.resilience import PayAdmitRejected
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_REQUESTS = Counter(
+    "idempotency_requests_total",
+    "Запросы с заголовком Idempotency-Key по результату обработки",
+    ["result"],
+)
+
+
+class IdempotencyService:
+    """
+    Обработка заголовка Idempotency-Key для операций, двигающих деньги.
+    Повтор с тем же ключом получает сохранённый ответ без вызова PayAdmit;
+    одновременные дубли внутри процесса ждут единственный исходный вызов,
+    а дубли из других воркеров получают 409, пока исходный запрос не завершится.
+    """
+
+    def __init__(self, store: IdempotencyStore):
+        self.store = store
+        self._in_flight: dict[str, tuple[str, asyncio.Future]] = {}
+
+    @staticmethod
+    def _fingerprint(payload: BaseModel) -> str:
+        return hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+
+    async def execute(
+        self,
+        key: str | None,
+        scope: str,
+        payload: BaseModel,
+        call: Callable[[], Awaitable[Any]],
+        lock_ttl: int | None = None,
+    ) -> Any:
+        """
+        Выполняет call не более одного раза для пары (scope, key).
+        :param key: Значение заголовка Idempotency-Key; без него call выполняется как обычно.
+        :param scope: Область ключа, например операция и ID пользователя.
+        :param payload: Тело запроса; повтор ключа с другим телом отклоняется с 422.
+        :param lock_ttl: Сколько держать ключ занятым, если call дольше IDEMPOTENCY.lock_ttl.
+        """
+        if key is None:
+            return await call()
+
+        # Ключ клиента хэшируется: длина записи не зависит от длины заголовка.
+        store_key = f"{scope}:{hashlib.sha256(key.encode()).hexdigest()}"
+        fingerprint = self._fingerprint(payload)
+
+        in_flight = self._in_flight.get(store_key)
+        if in_flight is not None:
+            self._check_fingerprint(in_flight[0], fingerprint)
+            IDEMPOTENCY_REQUESTS.labels("coalesced").inc()
+            return await asyncio.shield(in_flight[1])
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[store_key] = (fingerprint, future)
+        try:
+            result = await self._execute(store_key, fingerprint, call, lock_ttl)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._in_flight[store_key]
+
+    async def _execute(
+        self,
+        store_key: str,
+        fingerprint: str,
+        call: Callable[[], Awaitable[Any]],
+        lock_ttl: int | None,
+    ) -> Any:
+        stored = await self.store.reserve(store_key, fingerprint, lock_ttl)
+        if stored is not None:
+            self._check_fingerprint(stored.fingerprint, fingerprint)
+            if stored.body is None:
+                IDEMPOTENCY_REQUESTS.labels("in_progress").inc()
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Запрос с этим Idempotency-Key ещё выполняется "
+                    "или его результат неизвестен",
+                )
+            IDEMPOTENCY_REQUESTS.labels("replayed").inc()
+            return stored.body
+
+        try:
+            result = await call()
+        except (PayAdmitRejected, ValidationError):
+            # Запрос не дошёл до PayAdmit: клиент может повторить его с тем же ключом.
+            await self.store.release(store_key)
+            raise
+        except BaseException:
+            # PayAdmit мог успеть выполнить операцию (таймаут, обрыв, 5xx):
+            # повтор с этим ключом получит 409, а не создаст дубль.
+            IDEMPOTENCY_REQUESTS.labels("unknown").inc()
+            try:
+                await self.store.hold(store_key)
+            except Exception:
+                logger.exception("Failed to hold idempotency key %s", store_key)
+            raise
+        try:
+            await self.store.complete(store_key, fingerprint, result)
+        except Exception:
+            # Вызов уже выполнен: ключ остаётся занятым до lock_ttl, чтобы
+            # повтор получил 409, а не провёл операцию второй раз.
+            logger.exception("Failed to store idempotent response for %s", store_key)
+            IDEMPOTENCY_REQUESTS.labels("unsaved").inc()
+            return result
+        IDEMPOTENCY_REQUESTS.labels("executed").inc()
+        return result
+
+    @staticmethod
+    def _check_fingerprint(stored: str, fingerprint: str) -> None:
+        if stored != fingerprint:
+            IDEMPOTENCY_REQUESTS.labels("mismatch").inc()
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key уже использован с другим телом запроса",
+            )
+
+
+def create_idempotency_service(redis: Redis | None) -> IdempotencyService:
+    """Выбирает хранилище по IDEMPOTENCY.backend; auto — Redis при заданном REDIS_HOST, иначе Postgres."""
+    backend = settings.IDEMPOTENCY.backend
+    if backend == "auto":
+        backend = "redis" if redis is not None else "postgres"
+    if backend == "redis":
+        if redis is None:
+            raise RuntimeError("IDEMPOTENCY.backend=redis требует REDIS_HOST")
+        store = RedisIdempotencyStore(redis, settings.IDEMPOTENCY)
+    elif backend == "postgres":
+        store = PostgresIdempotencyStore(async_session, settings.IDEMPOTENCY)
+    else:
+        store = MemoryIdempotencyStore(settings.IDEMPOTENCY)
+    return IdempotencyService(store)
+
+
+def get_idempotency_service(request: Request) -> IdempotencyService:
+    """Dependency, возвращающая сервис идемпотентности из состояния приложения."""
+    return request.app.state.idempotency
@@ -0,0 +1,205 @@
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Protocol
+
+from redis.asyncio import Redis
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config.settings import IdempotencySettings
+from app.idempotency.models import IdempotencyRecord
+
+
+@dataclass(slots=True)
+class StoredResponse:
+    fingerprint: str
+    # None — исходный запрос ещё выполняется.
+    body: Any | None
+
+
+class IdempotencyStore(Protocol):
+    async def reserve(
+        self, key: str, fingerprint: str, lock_ttl: int | None = None
+    ) -> StoredResponse | None:
+        """
+        Пытается занять ключ. Возвращает None, если ключ занят этим вызовом,
+        иначе — уже сохранённую запись.
+        :param lock_ttl: Время блокировки вместо IDEMPOTENCY.lock_ttl.
+        """
+
+    async def complete(self, key: str, fingerprint: str, body: Any) -> None:
+        """Сохраняет ответ для повторов."""
+
+    async def release(self, key: str) -> None:
+        """Освобождает ключ после неудачного запроса, чтобы клиент мог повторить его."""
+
+    async def hold(self, key: str) -> None:
+        """Оставляет ключ занятым на IDEMPOTENCY.unknown_outcome_ttl без сохранённого ответа."""
+
+
+class MemoryIdempotencyStore:
+    """Хранилище в памяти процесса, для тестов и локального запуска."""
+
+    def __init__(self, config: IdempotencySettings):
+        self.config = config
+        self._records: dict[str, tuple[float, StoredResponse]] = {}
+
+    async def reserve(
+        self, key: str, fingerprint: str, lock_ttl: int | None = None
+    ) -> StoredResponse | None:
+        now = time.monotonic()
+        entry = self._records.get(key)
+        if entry is not None:
+            expires_at, record = entry
+            if expires_at > now:
+                return record
+        self._records[key] = (
+            now + (lock_ttl or self.config.lock_ttl),
+            StoredResponse(fingerprint, None),
+        )
+        return None
+
+    async def complete(self, key: str, fingerprint: str, body: Any) -> None:
+        self._records[key] = (
+            time.monotonic() + self.config.ttl,
+            StoredResponse(fingerprint, body),
+        )
+
+    async def release(self, key: str) -> None:
+        self._records.pop(key, None)
+
+    async def hold(self, key: str) -> None:
+        entry = self._records.get(key)
+        if entry is not None and entry[1].body is None:
+            self._records[key] = (
+                time.monotonic() + self.config.unknown_outcome_ttl,
+                entry[1],
+            )
+
+
+class PostgresIdempotencyStore:
+    """Хранилище в таблице idempotency_keys."""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        config: IdempotencySettings,
+    ):
+        self.session_factory = session_factory
+        self.config = config
+
+    def _is_expired(self, record: IdempotencyRecord) -> bool:
+        ttl = self.config.ttl if record.response is not None else self.config.lock_ttl
+        return record.created_at < datetime.now(timezone.utc) - timedelta(seconds=ttl)
+
+    async def reserve(
+        self, key: str, fingerprint: str, lock_ttl: int | None = None
+    ) -> StoredResponse | None:
+        # Блокировка истекает через config.lock_ttl после created_at,
+        # поэтому более длинная начинается как бы в будущем.
+        shift = timedelta(seconds=max(0, (lock_ttl or 0) - self.config.lock_ttl))
+        async with self.session_factory() as session:
+            for _ in range(2):
+                query = (
+                    insert(IdempotencyRecord)
+                    .values(
+                        key=key,
+                        fingerprint=fingerprint,
+                        created_at=datetime.now(timezone.utc) + shift,
+                    )
+                    .on_conflict_do_nothing(index_elements=[IdempotencyRecord.key])
+                    .returning(IdempotencyRecord.key)
+                )
+                reserved = (await session.execute(query)).scalar()
+                await session.commit()
+                if reserved is not None:
+                    return None
+
+                record = await session.scalar(
+                    select(IdempotencyRecord).where(IdempotencyRecord.key == key)
+                )
+                if record is None:
+                    continue
+                if not self._is_expired(record):
+                    return StoredResponse(record.fingerprint, record.response)
+                # Просроченная запись или брошенная блокировка: удаляем и пробуем снова.
+                await session.execute(
+                    delete(IdempotencyRecord).where(
+                        IdempotencyRecord.key == key,
+                        IdempotencyRecord.created_at == record.created_at,
+                    )
+                )
+                await session.commit()
+        return StoredResponse(fingerprint, None)
+
+    async def complete(self, key: str, fingerprint: str, body: Any) -> None:
+        async with self.session_factory() as session:
+            await session.execute(
+                update(IdempotencyRecord)
+                .where(IdempotencyRecord.key == key)
+                .values(response=body, created_at=datetime.now(timezone.utc))
+            )
+            await session.commit()
+
+    async def release(self, key: str) -> None:
+        async with self.session_factory() as session:
+            await session.execute(
+                delete(IdempotencyRecord).where(IdempotencyRecord.key == key)
+            )
+            await session.commit()
+
+    async def hold(self, key: str) -> None:
+        shift = timedelta(
+            seconds=max(0, self.config.unknown_outcome_ttl - self.config.lock_ttl)
+        )
+        async with self.session_factory() as session:
+            await session.execute(
+                update(IdempotencyRecord)
+                .where(
+                    IdempotencyRecord.key == key,
+                    IdempotencyRecord.response.is_(None),
+                )
+                .values(created_at=datetime.now(timezone.utc) + shift)
+            )
+            await session.commit()
+
+
+class RedisIdempotencyStore:
+    """Хранилище в Redis: SET NX с коротким TTL на время выполнения запроса."""
+
+    prefix = "idempotency:"
+
+    def __init__(self, redis: Redis, config: IdempotencySettings):
+        self.redis = redis
+        self.config = config
+
+    async def reserve(
+        self, key: str, fingerprint: str, lock_ttl: int | None = None
+    ) -> StoredResponse | None:
+        redis_key = self.prefix + key
+        value = json.dumps({"fingerprint": fingerprint, "body": None})
+        ex = lock_ttl or self.config.lock_ttl
+        for _ in range(2):
+            if await self.redis.set(redis_key, value, nx=True, ex=ex):
+                return None
+            stored = await self.redis.get(redis_key)
+            if stored is not None:
+                record = json.loads(stored)
+                return StoredResponse(record["fingerprint"], record["body"])
+        return StoredResponse(fingerprint, None)
+
+    async def complete(self, key: str, fingerprint: str, body: Any) -> None:
+        await self.redis.set(
+            self.prefix + key,
+            json.dumps({"fingerprint": fingerprint, "body": body}),
+            ex=self.config.ttl,
+        )
+
+    async def release(self, key: str) -> None:
+        await self.redis.delete(self.prefix + key)
+
+    async def hold(self, key: str) -> None:
+        await self.redis.expire(self.prefix + key, self.config.unknown_outcome_ttl)
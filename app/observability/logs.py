@@ -0,0 +1,121 @@
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
+
+from prometheus_client import Counter
+
+from app.config.settings import LoggingSettings, settings
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Записи лога, отброшенные до записи",
+    ["reason"],
+)
+
+REDACTED = "***"
+
+# Атрибуты LogRecord, которые не попадают в JSON как дополнительные поля.
+_RECORD_ATTRS = frozenset(
+    logging.makeLogRecord({}).__dict__.keys() | {"message", "asctime", "taskName"}
+)
+
+
+def redact(value: Any, fields: set[str]) -> Any:
+    """Возвращает копию значения, в которой значения ключей из fields заменены на ***."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if key in fields else redact(item, fields)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return type(value)(redact(item, fields) for item in value)
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматирует запись в одну строку JSON.
+    Поля, переданные через extra, выводятся отдельными ключами; персональные
+    и карточные данные в них и в аргументах сообщения маскируются.
+    """
+
+    def __init__(self, redact_fields: set[str]):
+        super().__init__()
+        self.redact_fields = redact_fields
+
+    def format(self, record: logging.LogRecord) -> str:
+        if record.args:
+            record.args = redact(record.args, self.redact_fields)
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = redact(value, self.redact_fields)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только долю записей INFO и ниже от шумных логгеров; WARNING и выше — всегда."""
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(record.name)
+        if rate is None or random.random() < rate:
+            return True
+        LOG_RECORDS_DROPPED.labels("sampled").inc()
+        return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Кладёт запись в очередь как есть: сообщение форматируется уже в потоке
+    QueueListener, а не в event loop. Переполненная очередь не блокирует
+    вызывающий код — запись отбрасывается и учитывается в метрике.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels("queue_full").inc()
+
+
+def configure_logging(config: LoggingSettings = settings.LOGGING) -> QueueListener:
+    """
+    Направляет корневой логгер в очередь, которую разбирает фоновый поток
+    и пишет JSON в stdout. Возвращённый listener нужно остановить при
+    завершении процесса, чтобы дописать очередь.
+    """
+    records: queue.Queue[logging.LogRecord] = queue.Queue(config.queue_size)
+    handler = NonBlockingQueueHandler(records)
+    handler.addFilter(SamplingFilter(config.sample_rates))
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter(config.redact_fields))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(config.level)
+
+    listener = QueueListener(records, output, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,61 @@
+import time
+
+from prometheus_client import Gauge, Histogram
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.observability.phases import start_request
+
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Обрабатываемые HTTP-запросы", ["method"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса по маршруту",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+HTTP_REQUEST_PHASE_DURATION = Histogram(
+    "http_request_phase_seconds",
+    "Время HTTP-запроса в отдельных фазах: БД, PayAdmit, bcrypt",
+    ["route", "phase"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware, замеряющий время запросов по шаблону маршрута
+    (а не по фактическому пути, чтобы ID в URL не плодили метки)
+    и раскладывающий его по фазам, учтённым в app.observability.phases.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        phases = start_request()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.labels(method).inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            HTTP_REQUESTS_IN_FLIGHT.labels(method).dec()
+            # Маршрут известен только после роутинга: Starlette дописывает его в scope.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.labels(method, route, status_code).observe(duration)
+            for phase, seconds in phases.items():
+                HTTP_REQUEST_PHASE_DURATION.labels(route, phase).observe(seconds)
@@ -0,0 +1,31 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Время, проведённое текущим запросом в отдельных фазах: db, payadmit, password_hashing.
+_phases: ContextVar[dict[str, float] | None] = ContextVar(
+    "request_phases", default=None
+)
+
+
+def start_request() -> dict[str, float]:
+    """Начинает учёт фаз для текущего запроса и возвращает словарь с их временем."""
+    phases: dict[str, float] = {}
+    _phases.set(phases)
+    return phases
+
+
+def record_phase(phase: str, seconds: float) -> None:
+    """Добавляет время к фазе текущего запроса; вне запроса ничего не делает."""
+    phases = _phases.get()
+    if phases is not None:
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def timed_phase(phase: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - started)
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+import orjson
+from fastapi import Depends, HTTPException, status
+from pydantic import RootModel, ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.config.settings import settings
+from app.db.database import async_session
+from app.payments.export import NDJSON_MEDIA_TYPE
+from app.payments.payment_repository import PaymentRepository
+from app.payments.payments_service import PayAdmitService
+from app.payments.schemas import CreatePaymentRequest
+from app.users.models import User
+
+logger = logging.getLogger(__name__)
+
+
+class PayoutBatch(RootModel[list[CreatePaymentRequest]]):
+    """Пакет выплат; отпечаток для Idempotency-Key считается по нему целиком."""
+
+
+# Фоновые задачи, дописывающие выплаты после обрыва соединения клиентом.
+_drains: set[asyncio.Task] = set()
+
+
+def parse_payouts(body: bytes, content_type: str) -> PayoutBatch:
+    """
+    Разбирает пакет выплат из JSON-массива или NDJSON (по объекту на строку)
+    за один проход валидации. Ошибка в любом элементе отклоняет весь пакет до
+    отправки чего-либо в PayAdmit.
+    """
+    if content_type.split(";")[0].strip() == NDJSON_MEDIA_TYPE:
+        lines = [line for line in body.splitlines() if line.strip()]
+        body = b"[" + b",".join(lines) + b"]"
+    try:
+        payouts = PayoutBatch.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.errors(include_url=False, include_context=False),
+        )
+    if not payouts.root:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Пакет выплат пуст",
+        )
+    if len(payouts.root) > settings.BULK_PAYOUTS.max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"В пакете больше {settings.BULK_PAYOUTS.max_items} выплат",
+        )
+    return payouts
+
+
+class BulkPayoutService:
+    """
+    Отправка пакета выплат в PayAdmit с ограниченным числом одновременных вызовов.
+    Результат каждой выплаты отдаётся строкой NDJSON по мере готовности,
+    созданные выплаты пишутся в таблицу payments пачками.
+    """
+
+    def __init__(self, payadmit_service: PayAdmitService = Depends()):
+        self.payadmit_service = payadmit_service
+        self.config = settings.BULK_PAYOUTS
+        # Собственные сессии: ответ стримится уже после закрытия сессии запроса.
+        self.session_factory = async_session
+
+    async def stream(
+        self, user: User, payouts: list[CreatePaymentRequest]
+    ) -> AsyncIterator[bytes]:
+        """
+        Отправляет выплаты и отдаёт результаты в порядке завершения.
+        Строка результата: {"index", "payment_id", "status"} или {"index", "error"}.
+        """
+        results: asyncio.Queue[tuple[dict, dict | None]] = asyncio.Queue()
+        pending = iter(enumerate(payouts))
+        stopped = False
+
+        async def worker():
+            for index, payout in pending:
+                if stopped:
+                    return
+                await results.put(await self._submit(user, index, payout))
+
+        workers = [
+            asyncio.create_task(worker())
+            for _ in range(min(self.config.concurrency, len(payouts)))
+        ]
+        rows: list[dict] = []
+        received = 0
+        try:
+            while received < len(payouts):
+                outcome, row = await results.get()
+                received += 1
+                if row is not None:
+                    rows.append(row)
+                if len(rows) >= self.config.insert_batch_size:
+                    await self._persist(rows)
+                    rows = []
+                yield orjson.dumps(outcome) + b"\n"
+            await self._persist(rows)
+            rows = []
+        finally:
+            # Уже начатые выплаты дописываются в фоне, даже если клиент отключился.
+            stopped = True
+            if received < len(payouts) or rows:
+                task = asyncio.create_task(self._drain(workers, results, rows))
+                _drains.add(task)
+                task.add_done_callback(_drains.discard)
+
+    async def collect(
+        self, user: User, payouts: list[CreatePaymentRequest]
+    ) -> list[dict]:
+        """Отправляет выплаты и возвращает все строки результата разом, для Idempotency-Key."""
+        return [orjson.loads(line) async for line in self.stream(user, payouts)]
+
+    async def _submit(
+        self, user: User, index: int, payout: CreatePaymentRequest
+    ) -> tuple[dict, dict | None]:
+        try:
+            data = await self.payadmit_service.create_payout(
+                user,
+                payout.amount,
+                payout.currency,
+                payout.customer,
+                payout.billingAddress,
+                record=False,
+            )
+        except HTTPException as e:
+            return {"index": index, "error": e.detail}, None
+        except Exception:
+            logger.exception("Bulk payout item %s failed", index)
+            return {"index": index, "error": "Ошибка при создании выплаты"}, None
+
+        result = data.get("result") if isinstance(data, dict) else None
+        if not isinstance(result, dict) or not result.get("id"):
+            return {"index": index, "error": data}, None
+        state = result.get("state", "PENDING")
+        row = {
+            "user_id": user.id,
+            "external_id": result["id"],
+            "payment_type": "WITHDRAWAL",
+            "amount": float(payout.amount),
+            "currency": payout.currency,
+            "status": state,
+            "created_at": datetime.now(timezone.utc),
+        }
+        return {"index": index, "payment_id": result["id"], "status": state}, row
+
+    async def _persist(self, rows: list[dict]) -> None:
+        """Записывает пачку выплат; ошибка логируется, выплаты восстановит сверка."""
+        if not rows:
+            return
+        try:
+            async with self.session_factory() as session:
+                await PaymentRepository(session).create_payments(rows)
+        except (SQLAlchemyError, OSError):
+            # Недоступная БД даёт голый OSError (asyncpg), в том числе при
+            # закрытии сессии, поэтому блок охватывает её целиком.
+            logger.exception("Failed to record %s bulk payouts locally", len(rows))
+
+    async def _drain(
+        self,
+        workers: list[asyncio.Task],
+        results: asyncio.Queue[tuple[dict, dict | None]],
+        rows: list[dict],
+    ) -> None:
+        """Дожидается начатых выплат и записывает все оставшиеся."""
+        await asyncio.gather(*workers, return_exceptions=True)
+        while not results.empty():
+            _, row = results.get_nowait()
+            if row is not None:
+                rows.append(row)
+        for start in range(0, len(rows), self.config.insert_batch_size):
+            await self._persist(rows[start : start + self.config.insert_batch_size])
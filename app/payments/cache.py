@@ -0,0 +1,145 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from fastapi import Request
+from prometheus_client import Counter
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.config.settings import PayAdmitCacheSettings
+
+logger = logging.getLogger(__name__)
+
+PAYADMIT_CACHE_LOOKUPS = Counter(
+    "payadmit_cache_lookups_total",
+    "Обращения к кэшу ответов PayAdmit",
+    ["operation", "result"],
+)
+
+
+class ResponseCache:
+    """
+    Read-through кэш коротко живущих ответов PayAdmit.
+    Первый уровень — LRU в памяти процесса, второй (опционально) — Redis,
+    общий для всех воркеров. Одновременные запросы одного ключа объединяются
+    в один вызов загрузчика (single-flight).
+    """
+
+    prefix = "payadmit:"
+
+    def __init__(self, config: PayAdmitCacheSettings, redis: Redis | None = None):
+        self.config = config
+        self.redis = redis if config.use_redis else None
+        self._local: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Future] = {}
+
+    def ttl(self, operation: str) -> float:
+        return self.config.ttls.get(operation, 0.0)
+
+    async def get_or_load(
+        self,
+        operation: str,
+        key: str,
+        loader: Callable[[], Awaitable[tuple[Any, bool]]],
+    ) -> Any:
+        """
+        Возвращает значение из кэша или загружает его.
+        :param loader: Возвращает (значение, можно_ли_кэшировать) — ошибки PayAdmit не кэшируются.
+        """
+        ttl = self.ttl(operation)
+        if not self.config.enabled or ttl <= 0:
+            value, _ = await loader()
+            return value
+
+        entry = self._local.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._local.move_to_end(key)
+            PAYADMIT_CACHE_LOOKUPS.labels(operation, "hit").inc()
+            return entry[1]
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            PAYADMIT_CACHE_LOOKUPS.labels(operation, "coalesced").inc()
+            return await asyncio.shield(in_flight)
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[key] = future
+        try:
+            value = await self._load(operation, key, ttl, loader)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._in_flight[key]
+
+    async def _load(
+        self,
+        operation: str,
+        key: str,
+        ttl: float,
+        loader: Callable[[], Awaitable[tuple[Any, bool]]],
+    ) -> Any:
+        if self.redis is not None:
+            try:
+                stored = await self.redis.get(self.prefix + key)
+            except RedisError:
+                logger.warning("Redis cache read failed for %s", key, exc_info=True)
+                stored = None
+            if stored is not None:
+                value = json.loads(stored)
+                self._set_local(key, value, ttl)
+                PAYADMIT_CACHE_LOOKUPS.labels(operation, "redis_hit").inc()
+                return value
+
+        PAYADMIT_CACHE_LOOKUPS.labels(operation, "miss").inc()
+        value, cacheable = await loader()
+        if cacheable:
+            self._set_local(key, value, ttl)
+            if self.redis is not None:
+                try:
+                    await self.redis.set(
+                        self.prefix + key, json.dumps(value), px=int(ttl * 1000)
+                    )
+                except RedisError:
+                    logger.warning(
+                        "Redis cache write failed for %s", key, exc_info=True
+                    )
+        return value
+
+    def _set_local(self, key: str, value: Any, ttl: float) -> None:
+        self._local[key] = (time.monotonic() + ttl, value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.config.max_size:
+            self._local.popitem(last=False)
+
+    async def invalidate(self, *keys: str) -> None:
+        for key in keys:
+            self._local.pop(key, None)
+        if self.redis is not None:
+            try:
+                await self.redis.delete(*(self.prefix + key for key in keys))
+            except RedisError:
+                logger.warning("Redis cache invalidation failed", exc_info=True)
+
+    async def invalidate_payment(self, payment_id: str) -> None:
+        """
+        Сбрасывает закэшированные статус и операции платежа.
+        В локальных LRU других воркеров запись доживёт свой короткий TTL.
+        """
+        await self.invalidate(f"status:{payment_id}", f"operations:{payment_id}")
+
+
+def get_payadmit_cache(request: Request) -> ResponseCache:
+    """Dependency, возвращающая кэш ответов PayAdmit из состояния приложения."""
+    return request.app.state.payadmit_cache
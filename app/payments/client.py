@@ -0,0 +1,164 @@
+import time
+
+import httpx
+from fastapi import Request
+from prometheus_client import Histogram
+from prometheus_client.core import GaugeMetricFamily
+from redis.asyncio import Redis
+
+from app.config.settings import (
+    PayAdmitGovernorSettings,
+    PayAdmitHTTP,
+    PayAdmitResilience,
+    settings,
+)
+from app.observability.phases import timed_phase
+from app.payments.governor import Governor
+from app.payments.resilience import Resilience
+
+PAYADMIT_REQUEST_DURATION = Histogram(
+    "payadmit_request_duration_seconds",
+    "Время одной попытки запроса к PayAdmit по методу PayAdmitService и статусу ответа",
+    ["operation", "status"],
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30),
+)
+
+
+class PayAdmitClient:
+    """
+    Общий для процесса HTTP-клиент к API PayAdmit.
+    Держит пул keep-alive соединений (опционально HTTP/2), поэтому запросы
+    не платят за новое TCP/TLS-рукопожатие. Создаётся один раз в lifespan приложения.
+    Все вызовы проходят через политику Resilience (bulkhead, circuit breaker, повторы)
+    и общий для воркеров лимит частоты Governor (через Redis, если он передан).
+    """
+
+    def __init__(
+        self,
+        config: PayAdmitHTTP = settings.PAYADMIT_HTTP,
+        resilience: PayAdmitResilience = settings.PAYADMIT_RESILIENCE,
+        governor: PayAdmitGovernorSettings = settings.PAYADMIT_GOVERNOR,
+        redis: Redis | None = None,
+    ):
+        self.config = config
+        self.resilience = Resilience(resilience, Governor(governor, redis))
+        self._client = httpx.AsyncClient(
+            http2=config.http2,
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=config.keepalive_expiry,
+            ),
+            timeout=self._timeout(config.read_timeout),
+        )
+
+    def _timeout(self, read_timeout: float) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.config.connect_timeout,
+            read=read_timeout,
+            write=self.config.write_timeout,
+            pool=self.config.pool_timeout,
+        )
+
+    def timeout_for(self, operation: str, budget: float | None = None) -> httpx.Timeout:
+        """
+        Таймаут для операции PayAdmitService с учётом переопределений из настроек.
+        :param budget: Остаток дедлайна вызова; ни одна фаза запроса не ждёт дольше него.
+        """
+        read_timeout = self.config.operation_timeouts.get(
+            operation, self.config.read_timeout
+        )
+        timeout = self._timeout(read_timeout)
+        if budget is None:
+            return timeout
+        return httpx.Timeout(
+            connect=min(timeout.connect, budget),
+            read=min(timeout.read, budget),
+            write=min(timeout.write, budget),
+            pool=min(timeout.pool, budget),
+        )
+
+    async def request(
+        self, operation: str, method: str, url: str, **kwargs
+    ) -> httpx.Response:
+        """
+        Выполняет запрос к PayAdmit через общий пул соединений.
+        Идемпотентные GET-запросы повторяются при сетевых ошибках и ответах 502–504.
+        """
+
+        async def send(budget: float) -> httpx.Response:
+            started = time.perf_counter()
+            status = "error"
+            try:
+                response = await self._client.request(
+                    method,
+                    url,
+                    **{"timeout": self.timeout_for(operation, budget), **kwargs},
+                )
+                status = str(response.status_code)
+                return response
+            finally:
+                PAYADMIT_REQUEST_DURATION.labels(operation, status).observe(
+                    time.perf_counter() - started
+                )
+
+        with timed_phase("payadmit"):
+            return await self.resilience.call(operation, method, send)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    def pool_stats(self) -> dict[str, int]:
+        """
+        Текущее состояние пула соединений: активные, простаивающие и ожидающие запросы.
+        У httpx и httpcore нет публичного API для очереди пула, поэтому внутренние
+        атрибуты читаются через getattr: после несовместимого обновления httpcore
+        метрики обнулятся, а не уронят /metrics. Используемые атрибуты закреплены
+        тестом tests/test_payadmit_client.py.
+        """
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", ()))
+        idle = sum(1 for connection in connections if _call(connection, "is_idle"))
+        queued = sum(
+            1
+            for request in getattr(pool, "_requests", ())
+            if _call(request, "is_queued")
+        )
+        return {"active": len(connections) - idle, "idle": idle, "queued": queued}
+
+
+def _call(obj, method: str) -> bool:
+    return bool(getattr(obj, method, lambda: False)())
+
+
+class PayAdmitPoolCollector:
+    """Экспортирует утилизацию пула соединений PayAdmitClient в Prometheus."""
+
+    def __init__(self, client: PayAdmitClient):
+        self.client = client
+
+    def collect(self):
+        stats = self.client.pool_stats()
+        connections = GaugeMetricFamily(
+            "payadmit_pool_connections",
+            "Соединения в пуле PayAdmit по состоянию",
+            labels=["state"],
+        )
+        connections.add_metric(["active"], stats["active"])
+        connections.add_metric(["idle"], stats["idle"])
+        yield connections
+        yield GaugeMetricFamily(
+            "payadmit_pool_queued_requests",
+            "Запросы, ожидающие свободного соединения в пуле PayAdmit",
+            value=stats["queued"],
+        )
+        yield GaugeMetricFamily(
+            "payadmit_pool_max_connections",
+            "Максимальный размер пула соединений PayAdmit",
+            value=self.client.config.max_connections,
+        )
+
+
+def get_payadmit_client(request: Request) -> PayAdmitClient:
+    """Dependency, возвращающая общий клиент PayAdmit из состояния приложения."""
+    return request.app.state.payadmit_client
@@ -0,0 +1,65 @@
+import csv
+import io
+from typing import AsyncIterator
+
+import orjson
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+
+
+async def ndjson_rows(pages: AsyncIterator[list[dict]]) -> AsyncIterator[bytes]:
+    """Сериализует платежи в NDJSON, по одному чанку на страницу."""
+    async for page in pages:
+        yield b"".join(orjson.dumps(item) + b"\n" for item in page)
+
+
+async def csv_rows(pages: AsyncIterator[list[dict]]) -> AsyncIterator[bytes]:
+    """
+    Сериализует платежи в CSV, по одному чанку на страницу.
+    Колонки берутся из ключей первого платежа; вложенные объекты пишутся как JSON.
+    """
+    writer = None
+    buffer = io.StringIO()
+    async for page in pages:
+        if writer is None:
+            writer = csv.DictWriter(
+                buffer, fieldnames=list(page[0]), extrasaction="ignore"
+            )
+            writer.writeheader()
+        writer.writerows(
+            {
+                key: (
+                    orjson.dumps(value).decode()
+                    if isinstance(value, (dict, list))
+                    else value
+                )
+                for key, value in item.items()
+            }
+            for item in page
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+async def prefetched(
+    pages: AsyncIterator[list[dict]],
+) -> AsyncIterator[list[dict]]:
+    """
+    Запрашивает первую страницу до начала ответа, чтобы ошибка PayAdmit
+    вернулась клиенту обычным HTTP-статусом, а не оборванным потоком.
+    """
+    first = await anext(pages, None)
+
+    async def all_pages():
+        try:
+            if first is None:
+                return
+            yield first
+            async for page in pages:
+                yield page
+        finally:
+            await pages.aclose()
+
+    return all_pages()
@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Protocol
+
+from prometheus_client import Counter, Gauge, Histogram
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.config.settings import PayAdmitGovernorSettings
+
+logger = logging.getLogger(__name__)
+
+PAYADMIT_GOVERNOR_RATE = Gauge(
+    "payadmit_governor_rate",
+    "Текущий лимит запросов к PayAdmit в секунду после подстройки по ответам 429",
+)
+PAYADMIT_THROTTLED = Counter(
+    "payadmit_throttled_total", "Ответы PayAdmit 429 по операции", ["operation"]
+)
+PAYADMIT_GOVERNOR_WAIT = Histogram(
+    "payadmit_governor_wait_seconds",
+    "Ожидание разрешения на вызов PayAdmit по приоритету",
+    ["priority"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5),
+)
+
+
+def parse_retry_after(value: str | None) -> float:
+    """Значение Retry-After в секундах: число секунд или HTTP-дата; 0, если не задано."""
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
+class GovernorState(Protocol):
+    async def acquire(self, priority: bool) -> tuple[float, float]:
+        """
+        Пытается взять разрешение на вызов.
+        :return: (сколько ждать до следующей попытки — 0, если разрешено; текущий лимит).
+        """
+
+    async def throttle(self, pause: float) -> float:
+        """Снижает лимит после 429 и приостанавливает вызовы на pause секунд."""
+
+
+class LocalGovernorState:
+    """
+    Token bucket с AIMD-подстройкой в памяти процесса — для одного воркера
+    или при недоступном Redis. Ёмкость — секунда квоты; обычные вызовы
+    не могут занять последние priority_reserve её долю.
+    """
+
+    def __init__(self, config: PayAdmitGovernorSettings):
+        self.config = config
+        self.rate = config.max_rate
+        self.tokens = config.max_rate
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.decreased_at = float("-inf")
+
+    def _capacity(self) -> float:
+        # Не меньше, чем нужно, чтобы обычный вызов мог пройти при любом лимите.
+        return max(self.rate, 1 / (1 - self.config.priority_reserve))
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self.updated_at)
+        self.rate = min(
+            self.config.max_rate, self.rate + self.config.increase_per_second * elapsed
+        )
+        self.tokens = min(self._capacity(), self.tokens + self.rate * elapsed)
+        self.updated_at = max(now, self.updated_at)
+
+    async def acquire(self, priority: bool) -> tuple[float, float]:
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now, self.rate
+        floor = 0.0 if priority else self.config.priority_reserve * self._capacity()
+        if self.tokens - 1 >= floor:
+            self.tokens -= 1
+            return 0.0, self.rate
+        return (floor + 1 - self.tokens) / self.rate, self.rate
+
+    async def throttle(self, pause: float) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        if now - self.decreased_at >= self.config.decrease_cooldown:
+            self.rate = max(
+                self.config.min_rate, self.rate * self.config.decrease_factor
+            )
+            self.decreased_at = now
+        # Бакет пустеет и не пополняется до конца паузы: после неё — плавный разгон.
+        self.tokens = 0.0
+        self.paused_until = max(self.paused_until, now + pause)
+        self.updated_at = max(self.updated_at, self.paused_until)
+        return self.rate
+
+
+# Тот же алгоритм, что в LocalGovernorState, атомарно над хэшем в Redis.
+# Время берётся из Redis, поэтому часы воркеров не влияют на результат.
+GOVERNOR_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local max_rate = tonumber(ARGV[2])
+local min_rate = tonumber(ARGV[3])
+local increase = tonumber(ARGV[4])
+local reserve = tonumber(ARGV[5])
+local state = redis.call(
+    'HMGET', KEYS[1], 'rate', 'tokens', 'updated_at', 'paused_until', 'decreased_at'
+)
+local rate = tonumber(state[1]) or max_rate
+local tokens = tonumber(state[2]) or max_rate
+local updated_at = tonumber(state[3]) or now
+local paused_until = tonumber(state[4]) or 0
+local decreased_at = tonumber(state[5]) or 0
+
+local elapsed = math.max(0, now - updated_at)
+rate = math.min(max_rate, rate + increase * elapsed)
+local capacity = math.max(rate, 1 / (1 - reserve))
+tokens = math.min(capacity, tokens + rate * elapsed)
+updated_at = math.max(now, updated_at)
+
+local wait = 0
+if ARGV[1] == 'throttle' then
+    local factor = tonumber(ARGV[6])
+    local cooldown = tonumber(ARGV[7])
+    local pause = tonumber(ARGV[8])
+    if now - decreased_at >= cooldown then
+        rate = math.max(min_rate, rate * factor)
+        decreased_at = now
+    end
+    tokens = 0
+    paused_until = math.max(paused_until, now + pause)
+    updated_at = math.max(updated_at, paused_until)
+elseif now < paused_until then
+    wait = paused_until - now
+else
+    local floor = 0
+    if ARGV[6] == '0' then
+        floor = reserve * capacity
+    end
+    if tokens - 1 >= floor then
+        tokens = tokens - 1
+    else
+        wait = (floor + 1 - tokens) / rate
+    end
+end
+
+redis.call(
+    'HSET', KEYS[1],
+    'rate', tostring(rate), 'tokens', tostring(tokens),
+    'updated_at', tostring(updated_at), 'paused_until', tostring(paused_until),
+    'decreased_at', tostring(decreased_at)
+)
+redis.call('EXPIRE', KEYS[1], 3600)
+return {tostring(wait), tostring(rate)}
+"""
+
+
+class RedisGovernorState:
+    """Состояние лимита в одном ключе Redis, общее для всех воркеров и процессов."""
+
+    key = "payadmit:governor"
+
+    def __init__(self, redis: Redis, config: PayAdmitGovernorSettings):
+        self.config = config
+        self._script = redis.register_script(GOVERNOR_SCRIPT)
+
+    async def _run(self, action: str, *args) -> tuple[float, float]:
+        config = self.config
+        wait, rate = await self._script(
+            keys=[self.key],
+            args=[
+                action,
+                config.max_rate,
+                config.min_rate,
+                config.increase_per_second,
+                config.priority_reserve,
+                *args,
+            ],
+        )
+        return float(wait), float(rate)
+
+    async def acquire(self, priority: bool) -> tuple[float, float]:
+        return await self._run("acquire", int(priority))
+
+    async def throttle(self, pause: float) -> float:
+        _, rate = await self._run(
+            "throttle",
+            self.config.decrease_factor,
+            self.config.decrease_cooldown,
+            pause,
+        )
+        return rate
+
+
+class Governor:
+    """
+    Глобальный лимит частоты запросов к PayAdmit.
+    Перед каждой попыткой вызов берёт разрешение из общего token bucket;
+    ответ 429 уменьшает лимит в decrease_factor раз (AIMD) и приостанавливает
+    вызовы на время из Retry-After, без 429 лимит линейно растёт обратно до квоты. Операции с деньгами
+    могут занять резерв квоты, недоступный чтению списков и баланса.
+    С Redis лимит общий для всех воркеров; при ошибке Redis используется
+    локальное состояние воркера.
+    """
+
+    def __init__(self, config: PayAdmitGovernorSettings, redis: Redis | None = None):
+        self.config = config
+        self.local = LocalGovernorState(config)
+        self.shared = (
+            RedisGovernorState(redis, config)
+            if redis is not None and config.use_redis
+            else None
+        )
+        PAYADMIT_GOVERNOR_RATE.set(config.max_rate)
+
+    async def _acquire(self, priority: bool) -> float:
+        if self.shared is not None:
+            try:
+                wait, rate = await self.shared.acquire(priority)
+                PAYADMIT_GOVERNOR_RATE.set(rate)
+                return wait
+            except RedisError:
+                logger.warning(
+                    "Redis governor failed, using local state", exc_info=True
+                )
+        wait, rate = await self.local.acquire(priority)
+        PAYADMIT_GOVERNOR_RATE.set(rate)
+        return wait
+
+    async def acquire(self, operation: str, max_wait: float) -> float:
+        """
+        Ждёт разрешения на вызов не дольше max_wait.
+        :return: 0, если вызов разрешён, иначе через сколько секунд стоит повторить.
+        """
+        if not self.config.enabled:
+            return 0.0
+        priority = operation in self.config.priority_operations
+        started = time.monotonic()
+        while (wait := await self._acquire(priority)) > 0:
+            if time.monotonic() - started + wait > max_wait:
+                return wait
+            await asyncio.sleep(wait)
+        PAYADMIT_GOVERNOR_WAIT.labels("high" if priority else "normal").observe(
+            time.monotonic() - started
+        )
+        return 0.0
+
+    async def throttled(self, operation: str, retry_after: str | None) -> None:
+        """Учитывает ответ 429 с необязательным заголовком Retry-After."""
+        PAYADMIT_THROTTLED.labels(operation).inc()
+        if not self.config.enabled:
+            return
+        pause = min(parse_retry_after(retry_after), self.config.max_pause)
+        if self.shared is not None:
+            try:
+                PAYADMIT_GOVERNOR_RATE.set(await self.shared.throttle(pause))
+                return
+            except RedisError:
+                logger.warning(
+                    "Redis governor failed, using local state", exc_info=True
+                )
+        PAYADMIT_GOVERNOR_RATE.set(await self.local.throttle(pause))
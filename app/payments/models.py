@@ -1,15 +1,33 @@
-from sqlalchemy import DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy import (
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime, timezone
 
 from app.db.database import Base
 
+# Статусы PayAdmit, после которых состояние платежа больше не меняется.
+TERMINAL_STATUSES = frozenset({"COMPLETED", "DECLINED", "CANCELLED", "FAILED"})
+
 
 class Payment(Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        # Keyset-пагинация истории платежей пользователя.
+        Index("ix_payments_user_id_created_at_id", "user_id", "created_at", "id"),
+        # ID платежа в PayAdmit; уникальный индекс заодно обслуживает поиск по нему.
+        UniqueConstraint("external_id", name="uq_payments_external_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"))
+    external_id: Mapped[str | None] = mapped_column(String(64))
     payment_type: Mapped[str] = mapped_column(String(20))
     amount: Mapped[float] = mapped_column(Float)
     currency: Mapped[str] = mapped_column(String(3), default="EUR")
@@ -17,3 +35,15 @@ class Payment(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
+
+
+class ReconciliationCheckpoint(Base):
+    """Позиция, на которой остановилась сверка платежей с PayAdmit."""
+
+    __tablename__ = "reconciliation_checkpoints"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    last_payment_id: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
@@ -0,0 +1,22 @@
+import base64
+import json
+from datetime import datetime
+
+
+def encode_cursor(created_at: datetime, payment_id: int) -> str:
+    """Упаковывает позицию последнего платежа страницы в непрозрачный курсор."""
+    raw = json.dumps([created_at.isoformat(), payment_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Распаковывает курсор, выданный encode_cursor.
+    :raises ValueError: Если курсор повреждён.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, payment_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(payment_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Некорректный курсор") from e
@@ -1,10 +1,16 @@
+from datetime import datetime, timezone
+
+from fastapi import Depends
+from sqlalchemy import String, column, tuple_, update, values
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.payments.models import Payment
+from app.db.database import get_db
+from app.payments.models import TERMINAL_STATUSES, Payment, ReconciliationCheckpoint
 
 
 class PaymentRepository:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession = Depends(get_db)):
         self.session = session
 
     async def create_payment(
@@ -14,6 +20,7 @@ class PaymentRepository:
         amount: float,
         currency: str = "EUR",
         status: str = "PENDING",
+        external_id: str | None = None,
     ):
         """
         Создает новый платеж в базе данных.
@@ -22,10 +29,12 @@ class PaymentRepository:
         :param amount: Сумма платежа.
         :param currency: Валюта платежа (по умолчанию "EUR").
         :param status: Статус платежа (по умолчанию "PENDING").
+        :param external_id: ID платежа в PayAdmit.
         :return: Созданный объект платежа.
         """
         new_payment = Payment(
             user_id=user_id,
+            external_id=external_id,
             payment_type=payment_type,
             amount=amount,
             currency=currency,
@@ -36,6 +45,22 @@ class PaymentRepository:
         await self.session.refresh(new_payment)
         return new_payment
 
+    async def create_payments(self, payments: list[dict]) -> None:
+        """
+        Создает пачку платежей одним INSERT.
+        Платежи с уже записанным external_id пропускаются.
+        :param payments: Список словарей с полями Payment.
+        """
+        if not payments:
+            return
+        query = (
+            insert(Payment)
+            .values(payments)
+            .on_conflict_do_nothing(constraint="uq_payments_external_id")
+        )
+        await self.session.execute(query)
+        await self.session.commit()
+
     async def update_payment_status(self, payment_id: int, status: str):
         """
         Обновляет статус платежа в базе данных.
@@ -55,6 +80,30 @@ class PaymentRepository:
         await self.session.refresh(payment)
         return payment
 
+    async def bulk_update_statuses(self, statuses: dict[str, str]) -> int:
+        """
+        Обновляет статусы пачки платежей одним запросом UPDATE ... FROM (VALUES ...).
+        Платежи в терминальном статусе не перезаписываются, чтобы запоздавший
+        вебхук не откатил итоговое состояние.
+        :param statuses: Словарь {external_id: новый статус}.
+        :return: Количество обновлённых строк.
+        """
+        if not statuses:
+            return 0
+        new_statuses = values(
+            column("external_id", String), column("status", String), name="v"
+        ).data(list(statuses.items()))
+        query = (
+            update(Payment)
+            .where(Payment.external_id == new_statuses.c.external_id)
+            .where(Payment.status.not_in(TERMINAL_STATUSES))
+            .values(status=new_statuses.c.status)
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.session.execute(query)
+        await self.session.commit()
+        return result.rowcount
+
     async def get_payment_by_id(self, payment_id: int):
         """
         Получает платеж по его ID.
@@ -65,22 +114,97 @@ class PaymentRepository:
         result = await self.session.execute(query)
         return result.scalars().first()
 
+    async def get_payment_by_external_id(self, external_id: str):
+        """
+        Получает платеж по его ID в PayAdmit.
+        :param external_id: ID платежа в PayAdmit.
+        :return: Объект платежа или None, если платеж не найден.
+        """
+        query = select(Payment).where(Payment.external_id == external_id)
+        result = await self.session.execute(query)
+        return result.scalars().first()
+
+    async def get_payments_by_external_ids(self, external_ids: list[str]):
+        """
+        Получает платежи по списку ID в PayAdmit одним запросом.
+        :param external_ids: ID платежей в PayAdmit.
+        :return: Список найденных платежей (отсутствующие ID пропускаются).
+        """
+        if not external_ids:
+            return []
+        query = select(Payment).where(Payment.external_id.in_(external_ids))
+        result = await self.session.execute(query)
+        return result.scalars().all()
+
     async def get_payments_by_user(
-        self, user_id: int, limit: int = 10, offset: int = 0
+        self,
+        user_id: int,
+        limit: int = 10,
+        after: tuple[datetime, int] | None = None,
     ):
         """
-        Получает список платежей пользователя.
+        Получает страницу платежей пользователя, от новых к старым.
+        Использует keyset-пагинацию по (created_at, id) вместо OFFSET,
+        поэтому время выборки не зависит от глубины страницы.
         :param user_id: ID пользователя.
         :param limit: Максимальное количество записей (по умолчанию 10).
-        :param offset: Количество пропускаемых записей (по умолчанию 0).
+        :param after: (created_at, id) последнего платежа предыдущей страницы.
+        :return: Список платежей.
+        """
+        query = select(Payment).where(Payment.user_id == user_id)
+        if after is not None:
+            query = query.where(tuple_(Payment.created_at, Payment.id) < tuple_(*after))
+        query = query.order_by(Payment.created_at.desc(), Payment.id.desc()).limit(
+            limit
+        )
+        result = await self.session.execute(query)
+        return result.scalars().all()
+
+    async def get_unsettled_payments(
+        self, after_id: int, created_before: datetime, limit: int
+    ):
+        """
+        Получает платежи PayAdmit в нетерминальном статусе, по возрастанию ID.
+        :param after_id: ID, после которого продолжить выборку.
+        :param created_before: Брать только платежи, созданные раньше этого момента.
+        :param limit: Максимальное количество записей.
         :return: Список платежей.
         """
         query = (
             select(Payment)
-            .where(Payment.user_id == user_id)
-            .order_by(Payment.created_at.desc())
+            .where(Payment.id > after_id)
+            .where(Payment.external_id.is_not(None))
+            .where(Payment.status.not_in(TERMINAL_STATUSES))
+            .where(Payment.created_at < created_before)
+            .order_by(Payment.id)
             .limit(limit)
-            .offset(offset)
         )
         result = await self.session.execute(query)
         return result.scalars().all()
+
+    async def get_checkpoint(self, name: str) -> int:
+        """
+        Получает ID последнего обработанного платежа для фоновой задачи.
+        :param name: Имя задачи.
+        :return: ID платежа или 0, если задача ещё не запускалась.
+        """
+        checkpoint = await self.session.get(ReconciliationCheckpoint, name)
+        return checkpoint.last_payment_id if checkpoint else 0
+
+    async def save_checkpoint(self, name: str, last_payment_id: int) -> None:
+        """
+        Сохраняет ID последнего обработанного платежа для фоновой задачи.
+        :param name: Имя задачи.
+        :param last_payment_id: ID платежа; 0 — начать следующий проход сначала.
+        """
+        now = datetime.now(timezone.utc)
+        query = (
+            insert(ReconciliationCheckpoint)
+            .values(name=name, last_payment_id=last_payment_id, updated_at=now)
+            .on_conflict_do_update(
+                index_elements=[ReconciliationCheckpoint.name],
+                set_={"last_payment_id": last_payment_id, "updated_at": now},
+            )
+        )
+        await self.session.execute(query)
+        await self.session.commit()
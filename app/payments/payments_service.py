@@ -1,16 +1,74 @@
+import asyncio
+import logging
+from decimal import Decimal
+from typing import AsyncIterator
+
 import httpx
-from fastapi import HTTPException
+import orjson
+from fastapi import Depends, HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+
 from app.config.settings import settings
+from app.db.database import release_connection
+from app.payments.cache import ResponseCache, get_payadmit_cache
+from app.payments.client import PayAdmitClient, get_payadmit_client
+from app.payments.models import TERMINAL_STATUSES, Payment
+from app.payments.payment_repository import PaymentRepository
+from app.payments.resilience import PayAdmitRejected
+from app.payments.schemas import (
+    BillingAddress,
+    Customer,
+    PaymentPayload,
+    PaymentResult,
+    payment_response_adapter,
+)
 from app.users.models import User
 
+logger = logging.getLogger(__name__)
+
+
+class PayAdmitStatusError(HTTPException):
+    """Ответ PayAdmit на запрос статуса с кодом, отличным от 200; body — его тело."""
+
+    def __init__(self, status_code: int, body):
+        super().__init__(
+            status_code=status_code, detail="Ошибка при проверке статуса платежа"
+        )
+        self.body = body
+
+
+def ledger_status(payment: Payment) -> dict:
+    """Ответ check_status, собранный из строки локальной таблицы payments."""
+    return {
+        "result": {
+            "id": payment.external_id,
+            "paymentType": payment.payment_type,
+            "state": payment.status,
+            "amount": payment.amount,
+            "currency": payment.currency,
+        }
+    }
+
 
 class PayAdmitService:
     """
     Сервис для работы с API партнера PayAdmit.
     Использует API-ключ для аутентификации и выполняет операции с платежами, выплатами и списками.
+    Статус, операции и баланс читаются через короткоживущий кэш, если он передан.
+    Созданные платежи, выплаты и возвраты записываются в локальную таблицу payments,
+    откуда check_status отвечает для платежей в терминальном статусе.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        client: PayAdmitClient = Depends(get_payadmit_client),
+        cache: ResponseCache | None = Depends(get_payadmit_cache),
+        payments: PaymentRepository | None = Depends(PaymentRepository),
+    ):
+        self.client = client
+        self.cache = cache
+        self.payments = payments
         self.api_url = settings.PAYADMIT_API_URL
         self.api_key = settings.API_KEY
 
@@ -18,6 +76,47 @@ class PayAdmitService:
         """Заголовки с API-ключом для авторизации."""
         return {"Authorization": f"Bearer {self.api_key}"}
 
+    async def _cached(self, operation: str, key: str, loader):
+        """Читает ответ через кэш; loader возвращает (данные, можно_ли_кэшировать)."""
+        if self.cache is None:
+            data, _ = await loader()
+            return data
+        return await self.cache.get_or_load(operation, key, loader)
+
+    async def _record_payment(
+        self,
+        user: User,
+        payment_type: str,
+        amount: Decimal,
+        currency: str,
+        result: PaymentResult,
+    ) -> None:
+        """
+        Записывает созданный в PayAdmit платеж в локальную таблицу payments.
+        Ошибка записи не отменяет уже созданный платеж: она логируется,
+        а сам платеж остаётся доступен через API PayAdmit.
+        """
+        if self.payments is None:
+            return
+        try:
+            await self.payments.create_payment(
+                user_id=user.id,
+                payment_type=payment_type,
+                amount=float(amount),
+                currency=currency,
+                status=result.state or "PENDING",
+                external_id=result.id,
+            )
+        except (SQLAlchemyError, OSError):
+            logger.exception(
+                "Failed to record %s payment %s locally", payment_type, result.id
+            )
+            try:
+                await self.payments.session.rollback()
+            except (SQLAlchemyError, OSError):
+                # Соединение уже потеряно; сессию закроет dependency запроса.
+                logger.warning("Rollback after failed payment record failed")
+
     async def get_payments(self, limit: int = 10, offset: int = 0):
         """
         Получает список платежей с учетом лимита и смещения.
@@ -29,6 +128,17 @@ class PayAdmitService:
         Возвращает:
         - JSON-ответ от API.
         """
+        return orjson.loads(await self.get_payments_raw(limit, offset))
+
+    async def get_payments_raw(self, limit: int = 10, offset: int = 0) -> bytes:
+        """
+        Получает список платежей как тело ответа PayAdmit без разбора JSON,
+        чтобы эндпоинт мог отдать его клиенту как есть.
+
+        Параметры:
+        - limit (int): Количество элементов для возврата (по умолчанию 10).
+        - offset (int): Количество элементов для пропуска (по умолчанию 0).
+        """
         if not (1 <= limit <= 1000):
             raise ValueError("Параметр 'limit' должен быть в диапазоне [1, 1000].")
         if offset < 0:
@@ -40,58 +150,181 @@ class PayAdmitService:
             "limit": limit,
             "offset": offset,
         }
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params, headers=headers)
-        return response.json()
+        response = await self.client.request(
+            "get_payments", "GET", url, params=params, headers=headers
+        )
+        return response.content
+
+    async def _fetch_payments_page(self, limit: int, offset: int) -> list[dict]:
+        url = f"{self.api_url}/payments"
+        headers = await self._get_headers()
+        response = await self.client.request(
+            "get_payments",
+            "GET",
+            url,
+            params={"limit": limit, "offset": offset},
+            headers=headers,
+        )
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail="Ошибка при получении списка платежей",
+            )
+        data = orjson.loads(response.content)
+        return data if isinstance(data, list) else data.get("result", [])
+
+    async def iter_payment_pages(
+        self, page_size: int = 1000
+    ) -> AsyncIterator[list[dict]]:
+        """
+        Обходит все страницы списка платежей PayAdmit.
+        Следующая страница запрашивается, пока обрабатывается текущая,
+        поэтому в памяти одновременно не больше двух страниц.
+
+        Параметры:
+        - page_size (int): Размер страницы, от 1 до 1000 (по умолчанию 1000).
+        """
+        if not (1 <= page_size <= 1000):
+            raise ValueError("Параметр 'page_size' должен быть в диапазоне [1, 1000].")
+
+        offset = 0
+        next_page = asyncio.create_task(self._fetch_payments_page(page_size, offset))
+        try:
+            while next_page is not None:
+                page = await next_page
+                next_page = None
+                if len(page) == page_size:
+                    offset += page_size
+                    next_page = asyncio.create_task(
+                        self._fetch_payments_page(page_size, offset)
+                    )
+                if page:
+                    yield page
+        finally:
+            if next_page is not None:
+                next_page.add_done_callback(lambda t: t.cancelled() or t.exception())
+                next_page.cancel()
+
+    def _payload(
+        self,
+        user: User,
+        payment_type: str,
+        amount: Decimal,
+        currency: str,
+        customer: Customer | None = None,
+        **fields,
+    ) -> dict:
+        """Собирает и валидирует тело POST /payments; email клиента берётся из аккаунта."""
+        if customer is not None:
+            customer = customer.model_copy(update={"email": user.email})
+        payload = PaymentPayload(
+            paymentType=payment_type,
+            amount=amount,
+            currency=currency,
+            customer=customer,
+            webhookUrl=f"{settings.WEBHOOK_URL}/webhooks/payment_status",
+            **fields,
+        )
+        return payload.model_dump(mode="json", exclude_none=True)
+
+    @staticmethod
+    def _parse_result(response: httpx.Response) -> PaymentResult | None:
+        """
+        Разбирает успешный ответ PayAdmit о созданном платеже.
+        Возвращает None для отказа 4xx и для ответа 200, который не удалось
+        разобрать: тело такого ответа отдаётся клиенту как есть.
+        429 и 5xx пробрасываются как HTTPException: это не ответ на запрос,
+        и сохранять его под Idempotency-Key нельзя.
+        """
+        if response.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+            headers = {}
+            if "Retry-After" in response.headers:
+                headers["Retry-After"] = response.headers["Retry-After"]
+            raise PayAdmitRejected(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Превышена квота запросов к PayAdmit",
+                headers=headers or None,
+            )
+        if response.status_code >= 500:
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"PayAdmit ответил {response.status_code}",
+            )
+        if response.status_code != 200:
+            return None
+        try:
+            return payment_response_adapter.validate_json(response.content).result
+        except ValidationError as e:
+            # Платеж уже создан: ошибка здесь приглашала бы клиента повторить
+            # запрос и создать дубль, поэтому клиент получает тело ответа как есть.
+            logger.error(
+                "Unexpected PayAdmit response for a created payment: %s",
+                e.errors(include_url=False, include_input=False),
+            )
+            return None
 
     async def create_payment(
-        self, user: User, amount: float, currency: str, customer: dict
+        self,
+        user: User,
+        amount: Decimal,
+        currency: str,
+        customer: Customer,
+        billing_address: BillingAddress | None = None,
     ):
         """Создает новый платеж."""
         url = f"{self.api_url}/payments"
         headers = await self._get_headers()
-        payload = {
-            "paymentType": "DEPOSIT",
-            "amount": amount,
-            "currency": currency,
-            "customer": {
-                "firstName": customer["firstName"],
-                "lastName": customer["lastName"],
-                "email": user.email,
-            },
-            "webhookUrl": f"{settings.WEBHOOK_URL}/webhooks/payment_status",
-        }
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, json=payload)
-        if response.status_code == 200:
-            result = response.json()["result"]
+        payload = self._payload(
+            user,
+            "DEPOSIT",
+            amount,
+            currency,
+            customer,
+            billingAddress=billing_address,
+        )
+        response = await self.client.request(
+            "create_payment", "POST", url, headers=headers, json=payload
+        )
+        result = self._parse_result(response)
+        if result is not None:
+            await self._record_payment(user, "DEPOSIT", amount, currency, result)
             return {
-                "payment_id": result.get("id"),
-                "status": result.get("state", "PENDING"),
-                "redirect_url": result.get("redirectUrl"),
+                "payment_id": result.id,
+                "status": result.state,
+                "redirect_url": result.redirectUrl,
                 "message": "Платеж успешно инициализирован. Пожалуйста, перейдите по ссылке для завершения платежа.",
             }
         return response.json()
 
     async def create_payout(
-        self, user: User, amount: int, currency: str, customer: dict
+        self,
+        user: User,
+        amount: Decimal,
+        currency: str,
+        customer: Customer,
+        billing_address: BillingAddress | None = None,
+        record: bool = True,
     ):
-        """Создает выплату."""
+        """
+        Создает выплату.
+        :param record: Записать выплату в таблицу payments; пакетная отправка пишет их сама.
+        """
         url = f"{self.api_url}/payments"
         headers = await self._get_headers()
-        payload = {
-            "paymentType": "WITHDRAWAL",
-            "amount": amount,
-            "currency": currency,
-            "customer": {
-                "firstName": customer["firstName"],
-                "lastName": customer["lastName"],
-                "email": user.email,
-            },
-            "webhookUrl": f"{settings.WEBHOOK_URL}/webhooks/payment_status",
-        }
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, json=payload)
+        payload = self._payload(
+            user,
+            "WITHDRAWAL",
+            amount,
+            currency,
+            customer,
+            billingAddress=billing_address,
+        )
+        response = await self.client.request(
+            "create_payout", "POST", url, headers=headers, json=payload
+        )
+        result = self._parse_result(response)
+        if record and result is not None:
+            await self._record_payment(user, "WITHDRAWAL", amount, currency, result)
         return response.json()
 
     async def confirm_payout(self, payment_id: str):
@@ -99,52 +332,88 @@ class PayAdmitService:
         url = f"{self.api_url}payments/confirmPayout"
         headers = await self._get_headers()
         payload = {"id": payment_id, "action": "PROCESS"}
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, json=payload)
+        response = await self.client.request(
+            "confirm_payout", "POST", url, headers=headers, json=payload
+        )
         return response.json()
 
     async def create_refund(
-        self, user: User, amount: float, currency: str, parent_id: str
+        self, user: User, amount: Decimal, currency: str, parent_id: str
     ):
-        print(amount, currency, parent_id)
-        """Создает выплату."""
+        """Создает возврат."""
         url = f"{self.api_url}/payments"
         headers = await self._get_headers()
-        payload = {
-            "paymentType": "REFUND",
-            "amount": amount,
-            "currency": currency,
-            "parentPaymentId": parent_id,
-        }
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, json=payload)
+        payload = self._payload(
+            user, "REFUND", amount, currency, parentPaymentId=parent_id
+        )
+        response = await self.client.request(
+            "create_refund", "POST", url, headers=headers, json=payload
+        )
+        result = self._parse_result(response)
+        if result is not None:
+            await self._record_payment(user, "REFUND", amount, currency, result)
         return response.json()
 
-    async def check_status(self, payment_id: str):
-        """Проверяет статус платежа."""
-        url = f"{self.api_url}/payments/{payment_id}"
-        headers = await self._get_headers()
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-        return response.json()
+    async def check_status(self, payment_id: str, strict: bool = False):
+        """
+        Проверяет статус платежа.
+        Платеж в терминальном статусе больше не меняется, поэтому такой статус
+        берётся из локальной таблицы payments без обращения к PayAdmit.
+        :param strict: Ответ PayAdmit с ошибкой пробрасывается как PayAdmitStatusError
+            с его кодом и телом, а не возвращается как данные.
+        """
+        if self.payments is not None:
+            payment = await self.payments.get_payment_by_external_id(payment_id)
+            if payment is not None and payment.status in TERMINAL_STATUSES:
+                return ledger_status(payment)
+            await release_connection(self.payments.session)
+
+        async def load():
+            url = f"{self.api_url}/payments/{payment_id}"
+            headers = await self._get_headers()
+            response = await self.client.request(
+                "check_status", "GET", url, headers=headers
+            )
+            if response.status_code != 200:
+                # Исключение, а не результат: ответ с ошибкой не кэшируется,
+                # а одновременные вызовы, делящие загрузку, получают его тело.
+                raise PayAdmitStatusError(response.status_code, response.json())
+            return response.json(), True
+
+        try:
+            return await self._cached("check_status", f"status:{payment_id}", load)
+        except PayAdmitStatusError as e:
+            if not strict:
+                return e.body
+            raise
 
     async def get_operations(self, payment_id: str):
         """Получает список всех операций."""
-        url = f"{self.api_url}/{payment_id}/operations"
-        headers = await self._get_headers()
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-        return response.json()
+
+        async def load():
+            url = f"{self.api_url}/{payment_id}/operations"
+            headers = await self._get_headers()
+            response = await self.client.request(
+                "get_operations", "GET", url, headers=headers
+            )
+            return response.json(), response.status_code == 200
+
+        return await self._cached("get_operations", f"operations:{payment_id}", load)
 
     async def get_balance(self):
         """Получает текущий баланс."""
-        url = f"{self.api_url}/balance"
-        headers = await self._get_headers()
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
+
+        async def load():
+            url = f"{self.api_url}/balance"
+            headers = await self._get_headers()
+            response = await self.client.request(
+                "get_balance", "GET", url, headers=headers
+            )
             if response.status_code != 200:
                 raise HTTPException(
                     status_code=response.status_code,
                     detail="Ошибка при получении баланса",
                 )
-        return response.json()
+            return response.json(), True
+
+        return await self._cached("get_balance", "balance", load)
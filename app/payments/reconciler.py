@@ -0,0 +1,272 @@
+import argparse
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from fastapi import HTTPException
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.config.settings import ReconcilerSettings, settings
+from app.db.database import async_session, engine, release_connection
+from app.db.redis import create_redis
+from app.observability.logs import configure_logging
+from app.payments.cache import ResponseCache
+from app.payments.client import PayAdmitClient
+from app.payments.payment_repository import PaymentRepository
+from app.payments.payments_service import PayAdmitService
+from app.payments.status_broker import StatusBroker, StatusEvent
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "payadmit_status"
+# Ключ pg_advisory_lock: сверку одновременно выполняет только один процесс.
+LOCK_KEY = 0x5041_5952_4543
+
+RECONCILER_PAYMENTS = Counter(
+    "reconciler_payments_total",
+    "Платежи, обработанные сверкой с PayAdmit, по результату",
+    ["result"],
+)
+RECONCILER_RUN_DURATION = Histogram(
+    "reconciler_run_duration_seconds",
+    "Длительность прохода сверки",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200),
+)
+RECONCILER_LAST_RUN = Gauge(
+    "reconciler_last_run_timestamp_seconds", "Время окончания последнего прохода сверки"
+)
+RECONCILER_LAST_RUN_DRIFTED = Gauge(
+    "reconciler_last_run_drifted", "Платежи с расхождением статуса в последнем проходе"
+)
+
+
+@dataclass(slots=True)
+class ReconcileStats:
+    checked: int = 0
+    drifted: int = 0
+    failed: int = 0
+
+
+class UnsettledPayment(NamedTuple):
+    id: int
+    external_id: str
+    status: str
+
+
+class RateLimiter:
+    """Token bucket: не больше rate вызовов в секунду с запасом на одну секунду."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.rate, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Reconciler:
+    """
+    Сверка локальных платежей с PayAdmit на случай потерянных вебхуков.
+    Проходит нетерминальные платежи старше min_age пачками по ID, запрашивает
+    их статусы с ограничением параллельности и частоты запросов и обновляет
+    разошедшиеся строки одним UPDATE на пачку. Позиция сохраняется после каждой
+    пачки, поэтому прерванный проход продолжается с того же места.
+    Исправленные статусы, как и статусы из вебхуков, сбрасываются в кэше
+    ответов PayAdmit и публикуются подписчикам SSE.
+    """
+
+    def __init__(
+        self,
+        client: PayAdmitClient,
+        session_factory: async_sessionmaker[AsyncSession] = async_session,
+        lock_engine: AsyncEngine = engine,
+        config: ReconcilerSettings = settings.RECONCILER,
+        cache: ResponseCache | None = None,
+        broker: StatusBroker | None = None,
+    ):
+        # Без кэша и локальной таблицы: check_status должен идти в PayAdmit.
+        self.service = PayAdmitService(client, cache=None, payments=None)
+        self.session_factory = session_factory
+        self.lock_engine = lock_engine
+        self.config = config
+        self.cache = cache
+        self.broker = broker
+        self.limiter = RateLimiter(config.rate_limit)
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Reconciliation run failed")
+            await asyncio.sleep(self.config.interval)
+
+    async def run_once(self) -> ReconcileStats | None:
+        """
+        Выполняет один проход сверки.
+        :return: Итоги прохода или None, если сверку уже выполняет другой процесс.
+        """
+        async with self.lock_engine.connect() as lock:
+            if not await lock.scalar(select(func.pg_try_advisory_lock(LOCK_KEY))):
+                logger.info("Reconciliation is already running elsewhere, skipping")
+                return None
+            try:
+                with RECONCILER_RUN_DURATION.time():
+                    stats = await self._run()
+            finally:
+                await lock.scalar(select(func.pg_advisory_unlock(LOCK_KEY)))
+        RECONCILER_LAST_RUN.set_to_current_time()
+        RECONCILER_LAST_RUN_DRIFTED.set(stats.drifted)
+        logger.info(
+            "Reconciliation finished: %d checked, %d drifted, %d failed",
+            stats.checked,
+            stats.drifted,
+            stats.failed,
+        )
+        return stats
+
+    async def _run(self) -> ReconcileStats:
+        stats = ReconcileStats()
+        created_before = datetime.now(timezone.utc) - timedelta(
+            seconds=self.config.min_age
+        )
+        async with self.session_factory() as session:
+            repository = PaymentRepository(session)
+            after_id = await repository.get_checkpoint(CHECKPOINT_NAME)
+            processed = 0
+            while processed < self.config.max_payments_per_run:
+                limit = min(
+                    self.config.batch_size,
+                    self.config.max_payments_per_run - processed,
+                )
+                payments = [
+                    UnsettledPayment(payment.id, payment.external_id, payment.status)
+                    for payment in await repository.get_unsettled_payments(
+                        after_id, created_before, limit
+                    )
+                ]
+                # Rollback помечает загруженные объекты устаревшими (expired),
+                # поэтому дальше используются только скопированные значения.
+                await release_connection(session)
+                processed += len(payments)
+                if payments:
+                    drifted = await self._fetch_drifted(payments, stats)
+                    await repository.bulk_update_statuses(drifted)
+                    await self._announce(drifted)
+                    after_id = payments[-1].id
+                if len(payments) < limit:
+                    # Дошли до конца: следующий проход начнётся сначала.
+                    await repository.save_checkpoint(CHECKPOINT_NAME, 0)
+                    break
+                await repository.save_checkpoint(CHECKPOINT_NAME, after_id)
+        return stats
+
+    async def _announce(self, drifted: dict[str, str]) -> None:
+        """Сбрасывает кэш и публикует новые статусы так же, как вебхук."""
+        for external_id, state in drifted.items():
+            if self.cache is not None:
+                await self.cache.invalidate_payment(external_id)
+            if self.broker is not None:
+                await self.broker.publish(StatusEvent(external_id, state))
+
+    async def _fetch_drifted(
+        self, payments: list[UnsettledPayment], stats: ReconcileStats
+    ) -> dict[str, str]:
+        """Запрашивает статусы пачки и возвращает {external_id: статус} разошедшихся."""
+        semaphore = asyncio.Semaphore(self.config.concurrency)
+
+        async def fetch(payment: UnsettledPayment) -> str | None:
+            async with semaphore:
+                await self.limiter.acquire()
+                try:
+                    data = await self.service.check_status(payment.external_id)
+                except HTTPException:
+                    return None
+            result = data.get("result") if isinstance(data, dict) else None
+            return result.get("state") if isinstance(result, dict) else None
+
+        states = await asyncio.gather(*(fetch(payment) for payment in payments))
+        drifted = {}
+        for payment, state in zip(payments, states):
+            if state is None:
+                stats.failed += 1
+                RECONCILER_PAYMENTS.labels("failed").inc()
+                continue
+            stats.checked += 1
+            RECONCILER_PAYMENTS.labels("checked").inc()
+            if state != payment.status:
+                drifted[payment.external_id] = state
+        stats.drifted += len(drifted)
+        RECONCILER_PAYMENTS.labels("drifted").inc(len(drifted))
+        return drifted
+
+
+async def main(loop: bool) -> None:
+    # Через Redis сверка делит квоту PayAdmit с воркерами приложения.
+    redis = create_redis()
+    client = PayAdmitClient(redis=redis)
+    # Слушатель pub/sub не нужен: события получают подписчики воркеров приложения.
+    reconciler = Reconciler(
+        client,
+        cache=ResponseCache(settings.PAYADMIT_CACHE, redis),
+        broker=StatusBroker(settings.STATUS_STREAM, redis),
+    )
+    try:
+        if not loop:
+            await reconciler.run_once()
+            return
+        reconciler.start()
+        await reconciler._task
+    finally:
+        await reconciler.stop()
+        await client.aclose()
+        if redis is not None:
+            await redis.aclose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Сверка незавершённых платежей с PayAdmit"
+    )
+    parser.add_argument(
+        "--loop",
+        action="store_true",
+        help="повторять сверку каждые RECONCILER__INTERVAL секунд",
+    )
+    args = parser.parse_args()
+    log_listener = configure_logging()
+    try:
+        asyncio.run(main(args.loop))
+    except SQLAlchemyError:
+        logger.exception("Reconciliation aborted")
+        raise SystemExit(1)
+    finally:
+        log_listener.stop()
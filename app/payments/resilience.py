@@ -0,0 +1,307 @@
+import asyncio
+import math
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable
+
+import httpx
+from fastapi import HTTPException, status
+from prometheus_client import Counter, Gauge
+
+from app.config.settings import PayAdmitResilience
+from app.payments.governor import Governor
+
+PAYADMIT_BREAKER_STATE = Gauge(
+    "payadmit_breaker_state",
+    "Состояние circuit breaker PayAdmit: 0 — закрыт, 1 — полуоткрыт, 2 — открыт",
+    ["operation"],
+)
+PAYADMIT_REJECTED = Counter(
+    "payadmit_rejected_total",
+    "Вызовы PayAdmit, отклонённые без обращения к API",
+    ["operation", "reason"],
+)
+PAYADMIT_RETRIES = Counter(
+    "payadmit_retries_total", "Повторные попытки вызовов PayAdmit", ["operation"]
+)
+PAYADMIT_BULKHEAD_IN_USE = Gauge(
+    "payadmit_bulkhead_in_use",
+    "Занятые места в bulkhead операций PayAdmit",
+    ["operation"],
+)
+
+# Ответы, которые считаются отказом PayAdmit и (для GET) повторяются.
+RETRYABLE_STATUSES = frozenset({502, 503, 504})
+# Превышение квоты: повторяется для GET, но не открывает circuit breaker.
+TOO_MANY_REQUESTS = 429
+
+_deadline: ContextVar[float | None] = ContextVar("payadmit_deadline", default=None)
+
+
+class PayAdmitRejected(HTTPException):
+    """
+    Вызов завершился, не дойдя до обработки в PayAdmit: отклонён breaker,
+    bulkhead или квотой, не удалось установить соединение, либо PayAdmit
+    ответил 429. Повтор такого вызова не может создать дубль операции.
+    """
+
+
+@contextmanager
+def deadline(seconds: float):
+    """
+    Ограничивает суммарное время вызовов PayAdmit внутри блока, включая повторы.
+    Вложенный дедлайн не может оказаться позже внешнего.
+    """
+    expires_at = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        expires_at = min(expires_at, current)
+    token = _deadline.set(expires_at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> float | None:
+    """Оставшееся время до дедлайна текущего контекста или None, если он не задан."""
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return expires_at - time.monotonic()
+
+
+def _unavailable(retry_after: float, detail: str) -> PayAdmitRejected:
+    return PayAdmitRejected(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def _deadline_exceeded() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        detail="PayAdmit не ответил за отведённое время",
+    )
+
+
+def _bad_gateway() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_502_BAD_GATEWAY,
+        detail="Ошибка соединения с PayAdmit",
+    )
+
+
+def _not_connected() -> PayAdmitRejected:
+    return PayAdmitRejected(
+        status_code=status.HTTP_502_BAD_GATEWAY,
+        detail="Не удалось подключиться к PayAdmit",
+    )
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker одной операции PayAdmit.
+    После failure_threshold отказов подряд вызовы отклоняются сразу; по истечении
+    reset_timeout пропускается ограниченное число пробных вызовов (half-open),
+    и по их результату breaker закрывается или снова открывается.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, operation: str, config: PayAdmitResilience):
+        self.operation = operation
+        self.config = config
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self._publish()
+
+    def _publish(self) -> None:
+        PAYADMIT_BREAKER_STATE.labels(self.operation).set(self.state)
+
+    def _transition(self, state: int) -> None:
+        self.state = state
+        self.probes = 0
+        if state == self.OPEN:
+            self.opened_at = time.monotonic()
+        elif state == self.CLOSED:
+            self.failures = 0
+        self._publish()
+
+    def acquire(self) -> None:
+        """Разрешает вызов или отклоняет его с 503, пока breaker открыт."""
+        if self.state == self.OPEN:
+            wait = self.opened_at + self.config.breaker_reset_timeout - time.monotonic()
+            if wait > 0:
+                PAYADMIT_REJECTED.labels(self.operation, "breaker_open").inc()
+                raise _unavailable(wait, "PayAdmit временно недоступен")
+            self._transition(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            if self.probes >= self.config.breaker_half_open_probes:
+                PAYADMIT_REJECTED.labels(self.operation, "breaker_open").inc()
+                raise _unavailable(1, "PayAdmit временно недоступен")
+            self.probes += 1
+
+    def release(self, success: bool | None) -> None:
+        """
+        Фиксирует результат вызова.
+        :param success: None — вызов отменён и ничего не говорит о состоянии PayAdmit.
+        """
+        if self.state == self.HALF_OPEN:
+            if success is None:
+                self.probes -= 1
+            else:
+                self._transition(self.CLOSED if success else self.OPEN)
+        elif success:
+            self.failures = 0
+        elif success is False:
+            self.failures += 1
+            if self.failures >= self.config.breaker_failure_threshold:
+                self._transition(self.OPEN)
+
+
+class Bulkhead:
+    """Ограничивает число одновременных вызовов одной операции PayAdmit."""
+
+    def __init__(self, operation: str, limit: int):
+        self.operation = operation
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self, wait: float) -> None:
+        try:
+            async with asyncio.timeout(max(wait, 0)):
+                await self._semaphore.acquire()
+        except TimeoutError:
+            PAYADMIT_REJECTED.labels(self.operation, "bulkhead_full").inc()
+            raise _unavailable(1, "Слишком много одновременных запросов к PayAdmit")
+        PAYADMIT_BULKHEAD_IN_USE.labels(self.operation).inc()
+
+    def release(self) -> None:
+        self._semaphore.release()
+        PAYADMIT_BULKHEAD_IN_USE.labels(self.operation).dec()
+
+
+class Resilience:
+    """
+    Политика вызовов PayAdmit: bulkhead на операцию, circuit breaker,
+    повторы с экспоненциальной задержкой и полным джиттером только для GET,
+    общий дедлайн на вызов вместе с повторами и, если задан governor,
+    глобальный лимит частоты перед каждой попыткой.
+    """
+
+    def __init__(self, config: PayAdmitResilience, governor: Governor | None = None):
+        self.config = config
+        self.governor = governor
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._bulkheads: dict[str, Bulkhead] = {}
+
+    def breaker(self, operation: str) -> CircuitBreaker:
+        if operation not in self._breakers:
+            self._breakers[operation] = CircuitBreaker(operation, self.config)
+        return self._breakers[operation]
+
+    def bulkhead(self, operation: str) -> Bulkhead:
+        if operation not in self._bulkheads:
+            limit = self.config.bulkheads.get(operation, self.config.default_bulkhead)
+            self._bulkheads[operation] = Bulkhead(operation, limit)
+        return self._bulkheads[operation]
+
+    def _backoff(self, attempt: int) -> float:
+        cap = min(
+            self.config.retry_max_delay, self.config.retry_base_delay * 2**attempt
+        )
+        return random.uniform(0, cap)
+
+    async def call(
+        self,
+        operation: str,
+        method: str,
+        send: Callable[[float], Awaitable[httpx.Response]],
+    ) -> httpx.Response:
+        """
+        Выполняет send(бюджет_времени_в_секундах) по политике операции.
+        Исчерпанный дедлайн — 504, открытый breaker или полный bulkhead — 503
+        с заголовком Retry-After.
+        """
+        attempts = self.config.retry_attempts if method == "GET" else 1
+        with deadline(self.config.request_budget):
+            bulkhead = self.bulkhead(operation)
+            await bulkhead.acquire(min(self.config.bulkhead_wait, remaining_budget()))
+            try:
+                response, error = None, None
+                for attempt in range(attempts):
+                    budget = remaining_budget()
+                    if budget <= 0:
+                        PAYADMIT_REJECTED.labels(operation, "deadline").inc()
+                        break
+                    await self._govern(operation, budget)
+                    try:
+                        response = await self._attempt(
+                            operation, send, remaining_budget()
+                        )
+                    except (
+                        httpx.ConnectError,
+                        httpx.ConnectTimeout,
+                        httpx.PoolTimeout,
+                    ):
+                        # Запрос не отправлен: соединение так и не было получено.
+                        response, error = None, _not_connected()
+                    except (TimeoutError, httpx.TimeoutException):
+                        response, error = None, _deadline_exceeded()
+                    except httpx.TransportError:
+                        response, error = None, _bad_gateway()
+                    else:
+                        if response.status_code == TOO_MANY_REQUESTS:
+                            if self.governor is not None:
+                                await self.governor.throttled(
+                                    operation, response.headers.get("Retry-After")
+                                )
+                        elif response.status_code not in RETRYABLE_STATUSES:
+                            return response
+                    delay = self._backoff(attempt)
+                    if attempt == attempts - 1 or delay >= remaining_budget():
+                        break
+                    PAYADMIT_RETRIES.labels(operation).inc()
+                    await asyncio.sleep(delay)
+                if response is not None:
+                    return response
+                raise error or _deadline_exceeded()
+            finally:
+                bulkhead.release()
+
+    async def _govern(self, operation: str, budget: float) -> None:
+        """Ждёт разрешения глобального лимита или отклоняет вызов с 503."""
+        if self.governor is None:
+            return
+        retry_after = await self.governor.acquire(
+            operation, min(self.governor.config.max_wait, budget)
+        )
+        if retry_after > 0:
+            PAYADMIT_REJECTED.labels(operation, "governor").inc()
+            raise _unavailable(retry_after, "Превышена квота запросов к PayAdmit")
+
+    async def _attempt(
+        self,
+        operation: str,
+        send: Callable[[float], Awaitable[httpx.Response]],
+        budget: float,
+    ) -> httpx.Response:
+        """Одна попытка под circuit breaker операции."""
+        breaker = self.breaker(operation)
+        breaker.acquire()
+        success = None
+        try:
+            async with asyncio.timeout(budget):
+                response = await send(budget)
+            success = response.status_code not in RETRYABLE_STATUSES
+            return response
+        except (TimeoutError, httpx.TransportError):
+            success = False
+            raise
+        finally:
+            breaker.release(success)
@@ -1,17 +1,118 @@
 # from enum import Enum
-from pydantic import BaseModel
+from datetime import datetime
+from decimal import Decimal
+from typing import Annotated, Literal
 
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    PlainSerializer,
+    StringConstraints,
+    TypeAdapter,
+)
 
-class CreatePaymentRequest(BaseModel):
-    amount: float
-    currency: str
-    customer: dict
+# Сумма хранится как Decimal без потери точности; в JSON для PayAdmit уходит числом.
+# strict=False: из JSON сумма приходит как int/float, строгий Decimal их не примет.
+Amount = Annotated[
+    Decimal,
+    Field(gt=0, max_digits=18, strict=False),
+    PlainSerializer(float, return_type=float, when_used="json"),
+]
+Currency = Annotated[str, StringConstraints(pattern=r"^[A-Z]{3}$")]
 
 
-class CreateRefundRequest(BaseModel):
-    amount: float
-    currency: str
-    parentPaymentId: str
+class PayAdmitRequestModel(BaseModel):
+    """Данные, которые отправляются в PayAdmit: строгая валидация, лишние поля запрещены."""
+
+    model_config = ConfigDict(strict=True, extra="forbid")
+
+
+class PayAdmitResponseModel(BaseModel):
+    """Данные, полученные от PayAdmit: неизвестные поля сохраняются как есть."""
+
+    model_config = ConfigDict(extra="allow")
+
+
+class Customer(PayAdmitRequestModel):
+    firstName: str = Field(min_length=1, max_length=100)
+    lastName: str = Field(min_length=1, max_length=100)
+    referenceId: str | None = None
+    citizenshipCountryCode: str | None = Field(None, min_length=2, max_length=2)
+    dateOfBirth: str | None = None
+    email: str | None = None
+    phone: str | None = None
+    locale: str | None = None
+    ip: str | None = None
+
+
+class BillingAddress(PayAdmitRequestModel):
+    addressLine1: str
+    addressLine2: str | None = None
+    city: str
+    countryCode: str = Field(min_length=2, max_length=2)
+    postalCode: str
+    state: str | None = None
+
+
+class PaymentMethodDetails(PayAdmitResponseModel):
+    customerAccountNumber: str | None = None
+    cardholderName: str | None = None
+    cardExpiryMonth: str | None = None
+    cardExpiryYear: str | None = None
+    cardBrand: str | None = None
+    cardIssuingCountry: str | None = None
+
+
+class CreatePaymentRequest(PayAdmitRequestModel):
+    amount: Amount
+    currency: Currency
+    customer: Customer
+    billingAddress: BillingAddress | None = None
+
+
+class CreateRefundRequest(PayAdmitRequestModel):
+    amount: Amount
+    currency: Currency
+    parentPaymentId: str = Field(min_length=1)
+
+
+class PaymentPayload(PayAdmitRequestModel):
+    """Тело запроса POST /payments в PayAdmit."""
+
+    paymentType: Literal["DEPOSIT", "WITHDRAWAL", "REFUND"]
+    amount: Amount
+    currency: Currency
+    customer: Customer | None = None
+    billingAddress: BillingAddress | None = None
+    parentPaymentId: str | None = None
+    webhookUrl: str | None = None
+
+
+class PaymentResult(PayAdmitResponseModel):
+    # PayAdmit может прислать числовой id и state: null — платеж при этом создан.
+    model_config = ConfigDict(extra="allow", coerce_numbers_to_str=True)
+
+    id: str
+    state: str | None = None
+    referenceId: str | None = None
+    paymentType: str | None = None
+    paymentMethod: str | None = None
+    paymentMethodDetails: PaymentMethodDetails | None = None
+    amount: Decimal | None = None
+    currency: str | None = None
+    redirectUrl: str | None = None
+    errorCode: str | None = None
+
+
+class PaymentResponse(PayAdmitResponseModel):
+    """Конверт ответа PayAdmit с платежом в поле result."""
+
+    result: PaymentResult
+
+
+# Валидаторы собираются один раз при импорте, а не на каждый ответ.
+payment_response_adapter = TypeAdapter(PaymentResponse)
 
 
 # class ConfirmationType(Enum):
@@ -19,6 +120,28 @@ class CreateRefundRequest(BaseModel):
 #     decline: str = "DECLINE"
 
 
+class PaymentStatusBatchRequest(BaseModel):
+    payment_ids: list[str] = Field(min_length=1)
+
+
 class PaymentConfirmationType(BaseModel):
     payment_id: str
     # action: ConfirmationType
+
+
+class PaymentOut(BaseModel):
+    id: int
+    external_id: str | None
+    payment_type: str
+    amount: float
+    currency: str
+    status: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class PaymentHistoryPage(BaseModel):
+    items: list[PaymentOut]
+    next_cursor: str | None
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+
+from fastapi import HTTPException, Request
+from prometheus_client import Counter, Histogram
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config.settings import StatusBatchSettings, settings
+from app.db.database import async_session
+from app.payments.cache import ResponseCache
+from app.payments.client import PayAdmitClient
+from app.payments.models import TERMINAL_STATUSES
+from app.payments.payment_repository import PaymentRepository
+from app.payments.payments_service import PayAdmitService, ledger_status
+
+logger = logging.getLogger(__name__)
+
+STATUS_BATCH_SIZE = Histogram(
+    "payment_status_batch_size",
+    "Число разных платежей в одной пачке запросов статуса",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 200, 500),
+)
+STATUS_LOOKUPS = Counter(
+    "payment_status_lookups_total",
+    "Запросы статуса платежа по источнику ответа",
+    ["source"],
+)
+
+
+class StatusBatcher:
+    """
+    Объединяет одновременные запросы статуса платежей.
+    Запросы собираются в пачку в течение window (или до max_batch разных ID);
+    повторный запрос того же платежа, пока его статус ещё загружается, ждёт
+    тот же результат. Терминальные статусы пачки берутся из таблицы payments
+    одним запросом, остальные — из PayAdmit (через кэш) не более чем
+    concurrency вызовами одновременно.
+    """
+
+    def __init__(
+        self,
+        client: PayAdmitClient,
+        cache: ResponseCache | None,
+        config: StatusBatchSettings = settings.STATUS_BATCH,
+        session_factory: async_sessionmaker[AsyncSession] = async_session,
+    ):
+        # Без локальной таблицы: её читает сама пачка, одним запросом.
+        self.service = PayAdmitService(client, cache, payments=None)
+        self.config = config
+        self.session_factory = session_factory
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._pending: list[str] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._batches: set[asyncio.Task] = set()
+
+    async def stop(self) -> None:
+        """Дожидается уже начатых пачек."""
+        self._flush()
+        await asyncio.gather(*self._batches, return_exceptions=True)
+
+    async def get(self, payment_id: str) -> dict:
+        """
+        Возвращает статус платежа в формате ответа check_status.
+        Ошибка PayAdmit пробрасывается как HTTPException; ответ не 200 — как
+        PayAdmitStatusError с телом ответа.
+        """
+        future = self._in_flight.get(payment_id)
+        if future is not None:
+            STATUS_LOOKUPS.labels("coalesced").inc()
+        else:
+            future = asyncio.get_running_loop().create_future()
+            # Результат может остаться без ожидающих, если все клиенты отключились.
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._in_flight[payment_id] = future
+            self._pending.append(payment_id)
+            if len(self._pending) >= self.config.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(
+                    self.config.window, self._flush
+                )
+        return await asyncio.shield(future)
+
+    async def get_many(self, payment_ids: list[str]) -> dict[str, dict | Exception]:
+        """Статусы нескольких платежей; ошибка по отдельному ID возвращается вместо его статуса."""
+        payment_ids = list(dict.fromkeys(payment_ids))
+        results = await asyncio.gather(
+            *(self.get(payment_id) for payment_id in payment_ids),
+            return_exceptions=True,
+        )
+        return dict(zip(payment_ids, results))
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._resolve(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _resolve(self, batch: list[str]) -> None:
+        STATUS_BATCH_SIZE.observe(len(batch))
+        futures = {payment_id: self._in_flight[payment_id] for payment_id in batch}
+        try:
+            remaining = await self._from_ledger(futures)
+            semaphore = asyncio.Semaphore(self.config.concurrency)
+
+            async def fetch(payment_id: str) -> None:
+                async with semaphore:
+                    try:
+                        data = await self.service.check_status(payment_id, strict=True)
+                    except HTTPException as e:
+                        STATUS_LOOKUPS.labels("error").inc()
+                        futures[payment_id].set_exception(e)
+                    except Exception as e:
+                        logger.exception("Status lookup for %s failed", payment_id)
+                        STATUS_LOOKUPS.labels("error").inc()
+                        futures[payment_id].set_exception(e)
+                    else:
+                        STATUS_LOOKUPS.labels("payadmit").inc()
+                        futures[payment_id].set_result(data)
+
+            await asyncio.gather(*(fetch(payment_id) for payment_id in remaining))
+        except Exception as e:
+            logger.exception("Status batch failed")
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for payment_id, future in futures.items():
+                if not future.done():
+                    future.cancel()
+                if self._in_flight.get(payment_id) is future:
+                    del self._in_flight[payment_id]
+
+    async def _from_ledger(self, futures: dict[str, asyncio.Future]) -> list[str]:
+        """Отвечает из таблицы payments для терминальных статусов; возвращает остальные ID."""
+        try:
+            async with self.session_factory() as session:
+                payments = await PaymentRepository(
+                    session
+                ).get_payments_by_external_ids(list(futures))
+        except (SQLAlchemyError, OSError):
+            logger.warning("Ledger lookup failed, asking PayAdmit", exc_info=True)
+            return list(futures)
+        for payment in payments:
+            if payment.status in TERMINAL_STATUSES:
+                STATUS_LOOKUPS.labels("ledger").inc()
+                futures[payment.external_id].set_result(ledger_status(payment))
+        return [
+            payment_id for payment_id, future in futures.items() if not future.done()
+        ]
+
+
+def get_status_batcher(request: Request) -> StatusBatcher:
+    """Dependency, возвращающая объединитель запросов статуса из состояния приложения."""
+    return request.app.state.status_batcher
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator
+
+import orjson
+from fastapi import Request
+from prometheus_client import Counter, Gauge
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.config.settings import StatusStreamSettings
+from app.db.database import async_session
+from app.payments.models import TERMINAL_STATUSES
+from app.payments.payment_repository import PaymentRepository
+
+logger = logging.getLogger(__name__)
+
+STATUS_SUBSCRIBERS = Gauge(
+    "payment_status_subscribers", "Клиенты, ожидающие изменения статуса платежа"
+)
+STATUS_EVENTS = Counter(
+    "payment_status_events_total",
+    "События изменения статуса платежа по источнику",
+    ["source"],
+)
+
+
+@dataclass(slots=True)
+class StatusEvent:
+    payment_id: str
+    state: str
+
+    def to_json(self) -> bytes:
+        return orjson.dumps(asdict(self))
+
+
+class StatusBroker:
+    """
+    Pub/sub изменений статуса платежей внутри процесса.
+    Вебхук публикует событие, подписчики (SSE-потоки) получают его из своей
+    очереди. С Redis событие уходит в канал pub/sub, и каждый воркер раздаёт
+    его своим подписчикам, поэтому клиент может быть подключён к любому воркеру.
+    """
+
+    channel = "payment_status"
+
+    def __init__(self, config: StatusStreamSettings, redis: Redis | None = None):
+        self.config = config
+        self.redis = redis if config.use_redis else None
+        self._subscribers: defaultdict[str, set[asyncio.Queue[StatusEvent]]] = (
+            defaultdict(set)
+        )
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self.redis is not None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    @contextmanager
+    def subscribe(self, payment_id: str):
+        """Подписывает на события платежа; очередь удаляется при выходе из блока."""
+        queue: asyncio.Queue[StatusEvent] = asyncio.Queue(self.config.queue_size)
+        self._subscribers[payment_id].add(queue)
+        STATUS_SUBSCRIBERS.inc()
+        try:
+            yield queue
+        finally:
+            STATUS_SUBSCRIBERS.dec()
+            subscribers = self._subscribers.get(payment_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[payment_id]
+
+    async def publish(self, event: StatusEvent) -> None:
+        if self.redis is not None:
+            try:
+                await self.redis.publish(self.channel, event.to_json())
+                return
+            except RedisError:
+                logger.warning(
+                    "Redis publish failed, delivering locally", exc_info=True
+                )
+        self._deliver(event, "local")
+
+    def _deliver(self, event: StatusEvent, source: str) -> None:
+        STATUS_EVENTS.labels(source).inc()
+        for queue in self._subscribers.get(event.payment_id, ()):
+            if queue.full():
+                # Медленному клиенту важен последний статус, а не вся история.
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        event = StatusEvent(**orjson.loads(message["data"]))
+                    except (ValueError, TypeError):
+                        logger.warning("Malformed payment status event ignored")
+                        continue
+                    self._deliver(event, "redis")
+            except RedisError:
+                logger.warning(
+                    "Redis pub/sub connection lost, reconnecting", exc_info=True
+                )
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+def _sse(event: StatusEvent) -> bytes:
+    return b"event: status\ndata: " + event.to_json() + b"\n\n"
+
+
+async def status_event_stream(
+    broker: StatusBroker, payment_id: str
+) -> AsyncIterator[bytes]:
+    """
+    Поток Server-Sent Events со статусами платежа.
+    Сначала отдаётся текущий статус из локальной таблицы payments (если платеж
+    там есть), затем каждое изменение; поток закрывается на терминальном статусе
+    или по истечении max_duration. Подписка оформляется до чтения текущего
+    статуса, поэтому изменение между ними не теряется.
+    """
+    config = broker.config
+    with broker.subscribe(payment_id) as queue:
+        async with async_session() as session:
+            payment = await PaymentRepository(session).get_payment_by_external_id(
+                payment_id
+            )
+        if payment is not None:
+            yield _sse(StatusEvent(payment_id, payment.status))
+            if payment.status in TERMINAL_STATUSES:
+                return
+
+        deadline = time.monotonic() + config.max_duration
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                async with asyncio.timeout(min(config.keepalive, remaining)):
+                    event = await queue.get()
+            except TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            yield _sse(event)
+            if event.state in TERMINAL_STATUSES:
+                return
+
+
+def get_status_broker(request: Request) -> StatusBroker:
+    """Dependency, возвращающая брокер статусов платежей из состояния приложения."""
+    return request.app.state.status_broker
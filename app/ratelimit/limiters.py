@@ -0,0 +1,156 @@
+import math
+import time
+from dataclasses import dataclass
+
+from redis.asyncio import Redis
+
+from app.config.settings import RateLimitRule
+
+
+@dataclass(slots=True)
+class RateLimitDecision:
+    allowed: bool
+    limit: int
+    remaining: int
+    # Секунды до полного восстановления квоты.
+    reset: float
+    period: float
+    # Секунды до следующего разрешённого запроса, если этот отклонён.
+    retry_after: float = 0.0
+
+    def headers(self) -> dict[str, str]:
+        """Заголовки RateLimit-* (draft-ietf-httpapi-ratelimit-headers)."""
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset)),
+            "RateLimit-Policy": f"{self.limit};w={math.ceil(self.period)}",
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+def _burst(rule: RateLimitRule) -> int:
+    return rule.burst if rule.burst is not None else rule.limit
+
+
+def max_cost(rule: RateLimitRule) -> int:
+    """
+    Наибольшая стоимость запроса, которую правило вообще может пропустить:
+    окно в памяти ограничено limit, GCRA — burst.
+    """
+    return min(rule.limit, _burst(rule))
+
+
+class MemorySlidingWindowLimiter:
+    """
+    Скользящее окно в памяти процесса: счётчики текущего и предыдущего окна,
+    предыдущее учитывается пропорционально непрошедшей доле. Лимит действует
+    на каждый воркер отдельно; burst не учитывается.
+    """
+
+    # При таком числе ключей из словаря удаляются давно не использованные.
+    max_keys = 10_000
+
+    def __init__(self):
+        self._windows: dict[str, tuple[int, int, int]] = {}
+
+    def hit(self, key: str, rule: RateLimitRule, cost: int = 1) -> RateLimitDecision:
+        now = time.monotonic()
+        window = int(now // rule.period)
+        start, previous, current = self._windows.get(key, (window, 0, 0))
+        if start != window:
+            previous = current if start == window - 1 else 0
+            current = 0
+        elapsed = now / rule.period - window
+        used = previous * (1 - elapsed) + current
+
+        if used + cost > rule.limit:
+            if current + cost > rule.limit:
+                # Ждём следующего окна, в котором текущее станет предыдущим.
+                fraction = 1 - (rule.limit - cost) / max(current, 1)
+                retry_at = (window + 1 + fraction) * rule.period
+            else:
+                fraction = 1 - (rule.limit - current - cost) / previous
+                retry_at = (window + fraction) * rule.period
+            self._windows[key] = (window, previous, current)
+            return RateLimitDecision(
+                False,
+                rule.limit,
+                0,
+                self._reset(now, window, rule),
+                rule.period,
+                retry_at - now,
+            )
+
+        current += cost
+        self._windows[key] = (window, previous, current)
+        if len(self._windows) > self.max_keys:
+            self._prune(window)
+        remaining = max(0, math.floor(rule.limit - used - cost))
+        return RateLimitDecision(
+            True, rule.limit, remaining, self._reset(now, window, rule), rule.period
+        )
+
+    @staticmethod
+    def _reset(now: float, window: int, rule: RateLimitRule) -> float:
+        # Запросы текущего окна перестают учитываться к концу следующего.
+        return (window + 2) * rule.period - now
+
+    def _prune(self, window: int) -> None:
+        self._windows = {
+            key: value for key, value in self._windows.items() if value[0] >= window - 1
+        }
+
+
+# GCRA: в ключе хранится теоретическое время прихода (TAT) следующего запроса.
+# Время берётся из Redis, поэтому часы воркеров не влияют на результат.
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval * cost
+local allow_at = new_tat - burst * interval
+if now < allow_at then
+    return {0, 0, tostring(tat - now), tostring(allow_at - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+local remaining = math.floor((now - allow_at) / interval)
+return {1, remaining, tostring(new_tat - now), '0'}
+"""
+
+
+class RedisGCRALimiter:
+    """
+    Generic cell rate algorithm в Redis: один ключ на пользователя и класс
+    операции, проверка и списание выполняются атомарно одним Lua-скриптом,
+    поэтому лимит общий для всех воркеров.
+    """
+
+    prefix = "ratelimit:"
+
+    def __init__(self, redis: Redis):
+        self._script = redis.register_script(GCRA_SCRIPT)
+
+    async def hit(
+        self, key: str, rule: RateLimitRule, cost: int = 1
+    ) -> RateLimitDecision:
+        allowed, remaining, reset, retry_after = await self._script(
+            keys=[self.prefix + key],
+            args=[rule.period / rule.limit, _burst(rule), cost],
+        )
+        return RateLimitDecision(
+            bool(allowed),
+            rule.limit,
+            min(int(remaining), rule.limit),
+            float(reset),
+            rule.period,
+            float(retry_after),
+        )
@@ -0,0 +1,150 @@
+import logging
+from typing import Callable
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from fastapi.routing import APIRoute
+from prometheus_client import Counter
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.auth.auth_service import AuthService
+from app.config.settings import RateLimitRule, RateLimitSettings, settings
+from app.ratelimit.limiters import (
+    MemorySlidingWindowLimiter,
+    RateLimitDecision,
+    RedisGCRALimiter,
+    max_cost,
+)
+from app.users.models import User
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_REQUESTS = Counter(
+    "rate_limit_requests_total",
+    "Запросы, прошедшие проверку лимита частоты, по результату",
+    ["operation", "result"],
+)
+
+
+class RateLimiter:
+    """
+    Лимит частоты запросов на пользователя и класс операции.
+    С Redis лимит общий для всех воркеров (GCRA); если Redis не задан или
+    недоступен, используется скользящее окно в памяти воркера.
+    """
+
+    def __init__(self, config: RateLimitSettings, redis: Redis | None = None):
+        self.config = config
+        self.redis = (
+            RedisGCRALimiter(redis) if redis is not None and config.use_redis else None
+        )
+        self.local = MemorySlidingWindowLimiter()
+
+    def rule(self, user_id: int, operation: str) -> RateLimitRule | None:
+        user_rules = self.config.user_rules.get(user_id, {})
+        return user_rules.get(operation) or self.config.rules.get(operation)
+
+    async def hit(
+        self, user_id: int, operation: str, cost: int = 1
+    ) -> RateLimitDecision | None:
+        """
+        Учитывает запрос пользователя.
+        :param cost: Сколько единиц лимита занимает запрос, например число выплат в пакете.
+        :return: Решение лимитера или None, если для операции лимит не задан.
+        """
+        rule = self.rule(user_id, operation)
+        if rule is None:
+            return None
+        key = f"{user_id}:{operation}"
+        if self.redis is not None:
+            try:
+                return await self.redis.hit(key, rule, cost)
+            except RedisError:
+                logger.warning(
+                    "Redis rate limiter failed, using local window", exc_info=True
+                )
+        return self.local.hit(key, rule, cost)
+
+
+def create_rate_limiter(redis: Redis | None) -> RateLimiter:
+    """Создаёт лимитер; Redis используется, если задан REDIS_HOST и RATE_LIMIT.use_redis."""
+    return RateLimiter(settings.RATE_LIMIT, redis)
+
+
+def get_rate_limiter(request: Request) -> RateLimiter:
+    """Dependency, возвращающая лимитер запросов из состояния приложения."""
+    return request.app.state.rate_limiter
+
+
+async def enforce_rate_limit(
+    request: Request,
+    limiter: RateLimiter,
+    user: User,
+    operation: str,
+    cost: int = 1,
+) -> None:
+    """
+    Учитывает запрос и отклоняет его с 429 и Retry-After при превышении лимита.
+    Для эндпоинтов, стоимость запроса в которых известна только после разбора тела.
+    Запрос дороже, чем лимит может пропустить, отклоняется с 413 без списания:
+    повтор после Retry-After всё равно бы не прошёл.
+    :param cost: Сколько единиц лимита занимает запрос.
+    """
+    if not limiter.config.enabled:
+        return
+    rule = limiter.rule(user.id, operation)
+    if rule is not None and cost > max_cost(rule):
+        RATE_LIMIT_REQUESTS.labels(operation, "too_large").inc()
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Запрос превышает лимит: не больше {max_cost(rule)} за раз",
+        )
+    decision = await limiter.hit(user.id, operation, cost)
+    if decision is None:
+        return
+    if not decision.allowed:
+        RATE_LIMIT_REQUESTS.labels(operation, "limited").inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Слишком много запросов, повторите позже",
+            headers=decision.headers(),
+        )
+    RATE_LIMIT_REQUESTS.labels(operation, "allowed").inc()
+    request.state.rate_limit = decision
+
+
+def rate_limit(operation: str):
+    """
+    Dependency, ограничивающая частоту запросов текущего пользователя.
+    Превышение лимита — 429 с Retry-After; заголовки RateLimit-* добавляет
+    к ответу RateLimitedRoute.
+    :param operation: Класс операции из RATE_LIMIT.rules, например create или read.
+    """
+
+    async def dependency(
+        request: Request,
+        user: User = Depends(AuthService.get_current_user),
+        limiter: RateLimiter = Depends(get_rate_limiter),
+    ) -> None:
+        await enforce_rate_limit(request, limiter, user, operation)
+
+    return dependency
+
+
+class RateLimitedRoute(APIRoute):
+    """
+    Добавляет заголовки RateLimit-* к ответу эндпоинта, в том числе когда
+    эндпоинт сам возвращает Response или StreamingResponse.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            response = await handler(request)
+            decision = getattr(request.state, "rate_limit", None)
+            if decision is not None:
+                response.headers.update(decision.headers())
+            return response
+
+        return route_handler
@@ -0,0 +1,44 @@
+import logging
+
+from app.db.database import async_session
+from app.payments.payment_repository import PaymentRepository
+from app.tasks.queue import Handler
+from app.webhooks.ingestion import StatusUpdate, write_status_updates
+
+logger = logging.getLogger(__name__)
+
+
+async def write_payment_statuses(payloads: list[dict]) -> None:
+    """Записывает статусы из вебхуков, накопленные во всех пачках сообщений."""
+    async with async_session() as session:
+        await write_status_updates(
+            session, [StatusUpdate(**payload) for payload in payloads]
+        )
+
+
+async def notify_users(payloads: list[dict]) -> None:
+    """
+    Уведомляет владельцев платежей о неуспешном статусе.
+    Владельцы всей пачки находятся одним запросом; канал доставки пока
+    не подключён, поэтому уведомление записывается в лог.
+    """
+    states = {payload["payment_id"]: payload["state"] for payload in payloads}
+    async with async_session() as session:
+        payments = await PaymentRepository(session).get_payments_by_external_ids(
+            list(states)
+        )
+    for payment in payments:
+        logger.info(
+            "User notified about payment status",
+            extra={
+                "user_id": payment.user_id,
+                "payment_id": payment.external_id,
+                "state": states[payment.external_id],
+            },
+        )
+
+
+HANDLERS: dict[str, Handler] = {
+    "payment_status": write_payment_statuses,
+    "notify_user": notify_users,
+}
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Protocol
+
+import aio_pika
+import orjson
+from aio_pika.exceptions import AMQPError
+from fastapi import Request
+from prometheus_client import Counter, Histogram
+
+from app.config.settings import TaskQueueSettings, settings
+
+logger = logging.getLogger(__name__)
+
+TASKS_PUBLISHED = Counter(
+    "tasks_published_total", "Задачи, поставленные в очередь", ["name"]
+)
+TASKS_PROCESSED = Counter(
+    "tasks_processed_total",
+    "Задачи, обработанные обработчиком, по результату",
+    ["name", "result"],
+)
+TASK_BATCH_SIZE = Histogram(
+    "task_batch_size",
+    "Число задач одного типа, переданных обработчику за раз",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+
+# Обработчик получает пачку полезных нагрузок задач одного типа.
+Handler = Callable[[list[dict]], Awaitable[None]]
+
+
+class TaskPublishError(Exception):
+    """Задачу не удалось поставить в очередь."""
+
+
+class TaskQueue(Protocol):
+    # True, если поставленные задачи переживают перезапуск приложения.
+    durable: bool
+
+    async def start(self) -> None: ...
+
+    async def stop(self) -> None: ...
+
+    async def publish(self, name: str, payloads: list[dict]) -> None: ...
+
+
+async def next_batch(
+    queue: asyncio.Queue, batch_size: int, flush_interval: float
+) -> list:
+    """Ждёт первый элемент и добирает пачку до batch_size не дольше flush_interval."""
+    loop = asyncio.get_running_loop()
+    batch = [await queue.get()]
+    deadline = loop.time() + flush_interval
+    while len(batch) < batch_size:
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), timeout))
+        except TimeoutError:
+            break
+    return batch
+
+
+async def run_handler(
+    handlers: dict[str, Handler], name: str, payloads: list[dict]
+) -> bool:
+    """
+    Передаёт пачку задач обработчику их типа.
+    :return: True, если пачка обработана; ошибка обработчика логируется.
+    """
+    handler = handlers.get(name)
+    if handler is None:
+        logger.error("No handler for task %s, %d tasks dropped", name, len(payloads))
+        TASKS_PROCESSED.labels(name, "unknown").inc(len(payloads))
+        return False
+    TASK_BATCH_SIZE.observe(len(payloads))
+    try:
+        await handler(payloads)
+    except Exception:
+        logger.exception("Task handler %s failed on %d tasks", name, len(payloads))
+        TASKS_PROCESSED.labels(name, "failed").inc(len(payloads))
+        return False
+    TASKS_PROCESSED.labels(name, "ok").inc(len(payloads))
+    return True
+
+
+def group_by_name(tasks: list[tuple[str, Any]]) -> dict[str, list]:
+    groups: dict[str, list] = {}
+    for name, item in tasks:
+        groups.setdefault(name, []).append(item)
+    return groups
+
+
+class MemoryTaskQueue:
+    """
+    Очередь задач в памяти процесса.
+    Задачи выполняются фоновой задачей того же event loop пачками по типу.
+    Подходит для разработки и тестов: при остановке очередь дописывается,
+    но задачи, не выполненные из-за падения процесса, теряются.
+    """
+
+    durable = False
+
+    def __init__(self, config: TaskQueueSettings, handlers: dict[str, Handler]):
+        self.config = config
+        self.handlers = handlers
+        self.queue: asyncio.Queue[tuple[str, dict]] = asyncio.Queue(
+            config.memory_queue_size
+        )
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        try:
+            await asyncio.wait_for(self.queue.join(), self.config.publish_timeout)
+        except TimeoutError:
+            logger.error(
+                "Task queue was not drained on shutdown, %d tasks lost",
+                self.queue.qsize(),
+            )
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def publish(self, name: str, payloads: list[dict]) -> None:
+        if self.queue.maxsize - self.queue.qsize() < len(payloads):
+            raise TaskPublishError("Очередь задач переполнена")
+        for payload in payloads:
+            self.queue.put_nowait((name, payload))
+        TASKS_PUBLISHED.labels(name).inc(len(payloads))
+
+    async def _run(self) -> None:
+        while True:
+            batch = await next_batch(
+                self.queue, self.config.batch_size, self.config.flush_interval
+            )
+            try:
+                for name, payloads in group_by_name(batch).items():
+                    await run_handler(self.handlers, name, payloads)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+
+class AMQPTaskQueue:
+    """
+    Публикация задач в RabbitMQ; выполняет их отдельный процесс app.tasks.worker.
+    Канал открыт с publisher confirms: publish возвращается после того, как
+    брокер записал сообщения, поэтому принятая задача не теряется при падении
+    приложения. Сообщения пачки публикуются параллельно, и подтверждения
+    ожидаются вместе, а не по одному.
+    """
+
+    durable = True
+
+    def __init__(self, config: TaskQueueSettings, url: str):
+        self.config = config
+        self.url = url
+        self._connection: aio_pika.abc.AbstractRobustConnection | None = None
+        self._channel: aio_pika.abc.AbstractChannel | None = None
+
+    async def start(self) -> None:
+        self._connection = await aio_pika.connect_robust(self.url)
+        self._channel = await self._connection.channel(publisher_confirms=True)
+        await declare_queue(self._channel, self.config)
+
+    async def stop(self) -> None:
+        if self._connection is not None:
+            await self._connection.close()
+
+    async def publish(self, name: str, payloads: list[dict]) -> None:
+        exchange = self._channel.default_exchange
+        try:
+            async with asyncio.timeout(self.config.publish_timeout):
+                await asyncio.gather(
+                    *(
+                        exchange.publish(
+                            aio_pika.Message(
+                                orjson.dumps(payload),
+                                type=name,
+                                content_type="application/json",
+                                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                            ),
+                            routing_key=self.config.queue_name,
+                        )
+                        for payload in payloads
+                    )
+                )
+        except (AMQPError, ConnectionError, TimeoutError) as e:
+            raise TaskPublishError(f"Не удалось опубликовать задачи {name}") from e
+        TASKS_PUBLISHED.labels(name).inc(len(payloads))
+
+
+async def declare_queue(
+    channel: aio_pika.abc.AbstractChannel, config: TaskQueueSettings
+) -> aio_pika.abc.AbstractQueue:
+    return await channel.declare_queue(config.queue_name, durable=True)
+
+
+def create_task_queue(
+    handlers: dict[str, Handler], config: TaskQueueSettings = settings.TASKS
+) -> TaskQueue:
+    """Создаёт очередь задач выбранного в настройках backend."""
+    if config.backend == "amqp":
+        return AMQPTaskQueue(config, settings.AMQP_URL)
+    return MemoryTaskQueue(config, handlers)
+
+
+def get_task_queue(request: Request) -> TaskQueue:
+    """Dependency, возвращающая очередь фоновых задач из состояния приложения."""
+    return request.app.state.task_queue
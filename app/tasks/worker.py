@@ -0,0 +1,82 @@
+import asyncio
+import logging
+
+import aio_pika
+import orjson
+from aio_pika.abc import AbstractIncomingMessage
+
+from app.config.settings import TaskQueueSettings, settings
+from app.db.database import engine
+from app.observability.logs import configure_logging
+from app.tasks.handlers import HANDLERS
+from app.tasks.queue import (
+    Handler,
+    declare_queue,
+    group_by_name,
+    next_batch,
+    run_handler,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def process_batch(
+    messages: list[AbstractIncomingMessage], handlers: dict[str, Handler]
+) -> None:
+    """
+    Обрабатывает пачку сообщений: задачи одного типа передаются обработчику
+    одним вызовом. Успешная группа подтверждается; при ошибке сообщения
+    возвращаются в очередь один раз, а повторно упавшие отклоняются, чтобы
+    «ядовитая» задача не блокировала очередь.
+    """
+    decoded = []
+    for message in messages:
+        try:
+            decoded.append((message.type, (message, orjson.loads(message.body))))
+        except orjson.JSONDecodeError:
+            logger.error("Malformed task %s rejected", message.type)
+            await message.reject()
+    for name, items in group_by_name(decoded).items():
+        group = [message for message, _ in items]
+        if await run_handler(handlers, name, [payload for _, payload in items]):
+            await asyncio.gather(*(message.ack() for message in group))
+        else:
+            await asyncio.gather(
+                *(message.reject(requeue=not message.redelivered) for message in group)
+            )
+
+
+async def consume(config: TaskQueueSettings = settings.TASKS) -> None:
+    """
+    Читает задачи из RabbitMQ и выполняет их пачками до batch_size или за
+    flush_interval. prefetch_count ограничивает число неподтверждённых
+    сообщений у воркера и тем самым размер локального буфера.
+    """
+    connection = await aio_pika.connect_robust(settings.AMQP_URL)
+    async with connection:
+        channel = await connection.channel()
+        await channel.set_qos(prefetch_count=config.prefetch_count)
+        queue = await declare_queue(channel, config)
+        received: asyncio.Queue[AbstractIncomingMessage] = asyncio.Queue()
+        await queue.consume(received.put)
+        logger.info("Task worker started", extra={"queue": config.queue_name})
+        while True:
+            batch = await next_batch(received, config.batch_size, config.flush_interval)
+            await process_batch(batch, HANDLERS)
+
+
+async def main() -> None:
+    try:
+        await consume()
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    log_listener = configure_logging()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        log_listener.stop()
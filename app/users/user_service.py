@@ -1,10 +1,11 @@
 from fastapi import Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from app.auth.token_cache import token_cache
 from app.db.database import get_db
 from app.users.models import User
 from app.users.schemas import UserCreate, UserOut
-from app.users.utils import hash_password, verify_password
+from app.users.utils import password_hasher
 
 
 class UserService:
@@ -28,7 +29,7 @@ class UserService:
         :param user_data: Данные для создания пользователя (email и пароль).
         :return: Созданный пользователь в формате UserOut.
         """
-        hashed_password = hash_password(user_data.password)
+        hashed_password = await password_hasher.hash(user_data.password)
         new_user = User(email=user_data.email, hashed_password=hashed_password)
 
         self.session.add(new_user)
@@ -41,6 +42,7 @@ class UserService:
     ) -> UserOut | None:
         """
         Проверяет учетные данные пользователя (email и пароль).
+        Если хэш пароля устарел, он прозрачно пересчитывается и сохраняется.
 
         :param email: Email пользователя.
         :param password: Пароль пользователя.
@@ -51,9 +53,18 @@ class UserService:
         result = await self.session.execute(query)
         user = result.scalars().first()
 
-        if user and verify_password(password, user.hashed_password):
-            return UserOut(id=user.id, email=user.email)
-        return None
+        if not user:
+            return None
+
+        is_valid, new_hash = await password_hasher.verify(
+            password, user.hashed_password
+        )
+        if not is_valid:
+            return None
+        if new_hash:
+            user.hashed_password = new_hash
+            await self.session.commit()
+        return UserOut(id=user.id, email=user.email)
 
     async def get_user_by_id(self, user_id: int) -> User | None:
         """
@@ -81,3 +92,4 @@ class UserService:
 
         await self.session.delete(user)
         await self.session.commit()
+        token_cache.invalidate_user(user_id)
@@ -1,6 +1,32 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
+from prometheus_client import Gauge, Histogram
+
+from app.config.settings import PasswordHashingSettings, settings
+from app.observability.phases import timed_phase
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Хэши с cost factor ниже текущего считаются устаревшими (needs_update).
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.PASSWORD_HASHING.bcrypt_rounds,
+    bcrypt__min_rounds=settings.PASSWORD_HASHING.bcrypt_rounds,
+)
+
+PASSWORD_POOL_QUEUED = Gauge(
+    "password_hashing_queued", "Операции bcrypt, ожидающие свободного воркера"
+)
+PASSWORD_POOL_IN_FLIGHT = Gauge(
+    "password_hashing_in_flight", "Операции bcrypt, выполняющиеся в пуле"
+)
+PASSWORD_POOL_DURATION = Histogram(
+    "password_hashing_duration_seconds",
+    "Время выполнения операции bcrypt в пуле",
+    ["operation"],
+)
 
 
 def hash_password(password: str) -> str:
@@ -9,3 +35,84 @@ def hash_password(password: str) -> str:
 
 def verify_password(password: str, hashed_password: str) -> bool:
     return pwd_context.verify(password, hashed_password)
+
+
+def verify_and_update_password(
+    password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    """Проверяет пароль и возвращает новый хэш, если текущий устарел (например, cost factor)."""
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+class PasswordHasherPool:
+    """
+    Выполняет bcrypt в отдельном пуле потоков или процессов, чтобы не блокировать event loop.
+    Число одновременных операций ограничено max_workers, очередь ожидающих — max_queue;
+    при переполнении очереди запрос отклоняется с 503.
+    """
+
+    def __init__(self, config: PasswordHashingSettings):
+        self.config = config
+        self._executor: Executor | None = None
+        self._semaphore = asyncio.Semaphore(config.max_workers)
+        self._queued = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.config.use_processes:
+                self._executor = ProcessPoolExecutor(self.config.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    self.config.max_workers, thread_name_prefix="bcrypt"
+                )
+        return self._executor
+
+    async def _run(self, func, *args):
+        with timed_phase("password_hashing"):
+            return await self._run_in_pool(func, *args)
+
+    async def _run_in_pool(self, func, *args):
+        if self._queued >= self.config.max_queue:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервис перегружен, повторите попытку позже",
+            )
+        self._queued += 1
+        PASSWORD_POOL_QUEUED.inc()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._queued -= 1
+            PASSWORD_POOL_QUEUED.dec()
+        PASSWORD_POOL_IN_FLIGHT.inc()
+        try:
+            loop = asyncio.get_running_loop()
+            with PASSWORD_POOL_DURATION.labels(func.__name__).time():
+                return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            PASSWORD_POOL_IN_FLIGHT.dec()
+            self._semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(
+        self, password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        """
+        Проверяет пароль. Второй элемент результата — новый хэш, если включён
+        rehash_on_login и pwd_context считает текущий хэш устаревшим.
+        """
+        if self.config.rehash_on_login:
+            return await self._run(
+                verify_and_update_password, password, hashed_password
+            )
+        return await self._run(verify_password, password, hashed_password), None
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasherPool(settings.PASSWORD_HASHING)
@@ -0,0 +1,256 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+
+from fastapi import HTTPException, Request, status
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config.settings import WebhookSettings, settings
+from app.db.database import async_session
+from app.payments.payment_repository import PaymentRepository
+from app.tasks.queue import TaskPublishError, TaskQueue, next_batch
+from app.webhooks.webhook_repository import WebhookEventRepository
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_QUEUE_DEPTH = Gauge(
+    "webhook_ingestion_queue_depth", "Вебхуки, ожидающие записи в БД"
+)
+WEBHOOK_REJECTED = Counter(
+    "webhook_ingestion_rejected_total",
+    "Вебхуки, отклонённые из-за переполнения очереди",
+)
+WEBHOOK_BATCH_SIZE = Histogram(
+    "webhook_ingestion_batch_size",
+    "Число платежей в одной пакетной записи",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+WEBHOOK_FLUSH_DURATION = Histogram(
+    "webhook_ingestion_flush_duration_seconds", "Время пакетной записи статусов"
+)
+WEBHOOK_DUPLICATES = Counter(
+    "webhook_duplicates_total",
+    "Повторные доставки вебхуков, отброшенные дедупликацией",
+    ["layer"],
+)
+WEBHOOK_FLUSH_FAILED = Counter(
+    "webhook_ingestion_flush_failed_total",
+    "Обновления статусов, потерянные после всех попыток записи",
+)
+WEBHOOK_REQUEUED = Counter(
+    "webhook_ingestion_requeued_total",
+    "Обновления статусов, возвращённые в очередь после неудачной записи",
+)
+
+
+@dataclass(slots=True)
+class StatusUpdate:
+    external_id: str
+    status: str
+    digest: str
+
+    @property
+    def key(self) -> tuple[str, str, str]:
+        return self.external_id, self.status, self.digest
+
+
+class RecentEvents:
+    """LRU-множество ключей недавно принятых событий — быстрый фронт дедупликации."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._keys: OrderedDict[tuple, None] = OrderedDict()
+
+    def __contains__(self, key: tuple) -> bool:
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return True
+        return False
+
+    def add(self, key: tuple) -> None:
+        self._keys[key] = None
+        self._keys.move_to_end(key)
+        if len(self._keys) > self.max_size:
+            self._keys.popitem(last=False)
+
+    def discard(self, key: tuple) -> None:
+        self._keys.pop(key, None)
+
+
+class WebhookIngestor:
+    """
+    Очередь приёма вебхуков PayAdmit.
+    Эндпоинт только кладёт событие в очередь и сразу отвечает; фоновая задача
+    собирает события в пачки (до batch_size или за flush_interval), оставляет
+    последний статус каждого платежа и пишет пачку одним UPDATE.
+    Повторные доставки (тот же платёж, статус и тело) отсекаются по LRU в памяти,
+    а после перезапуска — уникальным индексом таблицы webhook_events,
+    не затрагивая строку платежа.
+    Переполненная очередь отвечает 503, и PayAdmit повторит доставку позже.
+    Не записанная пачка возвращается в очередь не более requeue_limit раз;
+    потерянные события забываются дедупликацией, чтобы повтор был принят.
+    Событие, которое за время записи сменил более новый статус того же платежа,
+    в очередь не возвращается: иначе оно встало бы за новым и перезаписало его.
+    При остановке приложения очередь дописывается в БД.
+    С task_queue пачка не пишется в БД, а публикуется задачами payment_status
+    для воркера; если опубликовать не удалось, она записывается напрямую.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = async_session,
+        config: WebhookSettings = settings.WEBHOOKS,
+        task_queue: TaskQueue | None = None,
+    ):
+        self.session_factory = session_factory
+        self.config = config
+        self.task_queue = task_queue
+        self.queue: asyncio.Queue[StatusUpdate] = asyncio.Queue(config.queue_size)
+        self.recent = RecentEvents(config.dedup_cache_size)
+        # Число неудачных записей для событий, возвращённых в очередь.
+        self._failures: dict[tuple, int] = {}
+        # Последнее принятое событие каждого платежа, пока оно не записано.
+        self._latest: dict[str, tuple] = {}
+        self._task: asyncio.Task | None = None
+        self._closed = False
+
+    def start(self) -> None:
+        WEBHOOK_QUEUE_DEPTH.set_function(self.queue.qsize)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Перестаёт принимать события и дожидается записи уже принятых."""
+        self._closed = True
+        try:
+            await asyncio.wait_for(self.queue.join(), self.config.shutdown_timeout)
+        except TimeoutError:
+            logger.error(
+                "Webhook queue was not flushed on shutdown, %d updates lost",
+                self.queue.qsize(),
+            )
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def submit(self, update: StatusUpdate) -> bool:
+        """Ставит событие в очередь. Возвращает False, если это повторная доставка."""
+        if update.key in self.recent:
+            WEBHOOK_DUPLICATES.labels("memory").inc()
+            return False
+        if self._closed:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Приём вебхуков остановлен",
+            )
+        try:
+            await asyncio.wait_for(self.queue.put(update), self.config.enqueue_timeout)
+        except TimeoutError:
+            WEBHOOK_REJECTED.inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Очередь вебхуков переполнена",
+            )
+        self.recent.add(update.key)
+        self._latest[update.external_id] = update.key
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            batch = await next_batch(
+                self.queue, self.config.batch_size, self.config.flush_interval
+            )
+            try:
+                try:
+                    written = await self._flush(batch)
+                except Exception:
+                    # Фоновая задача не должна завершаться: иначе очередь
+                    # переполнится и все вебхуки будут получать 503.
+                    logger.exception("Unexpected error while flushing webhook batch")
+                    written = False
+                if written:
+                    for update in batch:
+                        self._failures.pop(update.key, None)
+                        self._forget(update)
+                else:
+                    self._requeue(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _requeue(self, batch: list[StatusUpdate]) -> None:
+        dropped = []
+        for update in batch:
+            if self._latest.get(update.external_id) != update.key:
+                # Новый статус платежа уже в очереди, старый ему больше не нужен.
+                self._failures.pop(update.key, None)
+                continue
+            failures = self._failures.pop(update.key, 0) + 1
+            if failures > self.config.requeue_limit or self.queue.full():
+                dropped.append(update)
+                continue
+            self._failures[update.key] = failures
+            self.queue.put_nowait(update)
+            WEBHOOK_REQUEUED.inc()
+        if dropped:
+            logger.error("%d webhook status updates were not written", len(dropped))
+            WEBHOOK_FLUSH_FAILED.inc(len(dropped))
+            # Повторная доставка потерянного события должна быть принята.
+            for update in dropped:
+                self.recent.discard(update.key)
+                self._forget(update)
+
+    def _forget(self, update: StatusUpdate) -> None:
+        if self._latest.get(update.external_id) == update.key:
+            del self._latest[update.external_id]
+
+    async def _flush(self, batch: list[StatusUpdate]) -> bool:
+        """Публикует или записывает пачку. Возвращает False, если все попытки не удались."""
+        WEBHOOK_BATCH_SIZE.observe(len(batch))
+        if self.task_queue is not None:
+            try:
+                await self.task_queue.publish(
+                    "payment_status", [asdict(update) for update in batch]
+                )
+                return True
+            except TaskPublishError:
+                logger.warning(
+                    "Failed to publish webhook batch, writing it directly",
+                    exc_info=True,
+                )
+        for attempt in range(1, self.config.flush_retries + 1):
+            try:
+                with WEBHOOK_FLUSH_DURATION.time():
+                    async with self.session_factory() as session:
+                        await write_status_updates(session, batch)
+                return True
+            except (SQLAlchemyError, OSError):
+                logger.exception(
+                    "Failed to write webhook batch (attempt %d/%d)",
+                    attempt,
+                    self.config.flush_retries,
+                )
+                if attempt < self.config.flush_retries:
+                    await asyncio.sleep(min(2**attempt * 0.1, 5))
+        return False
+
+
+async def write_status_updates(
+    session: AsyncSession, batch: list[StatusUpdate]
+) -> None:
+    """Записывает новые события и статусы платежей в одной транзакции."""
+    inserted = await WebhookEventRepository(session).record_events(
+        list({update.key: None for update in batch})
+    )
+    WEBHOOK_DUPLICATES.labels("database").inc(len(batch) - len(inserted))
+    statuses = {
+        update.external_id: update.status for update in batch if update.key in inserted
+    }
+    await PaymentRepository(session).bulk_update_statuses(statuses)
+
+
+def get_webhook_ingestor(request: Request) -> WebhookIngestor:
+    """Dependency, возвращающая очередь приёма вебхуков из состояния приложения."""
+    return request.app.state.webhook_ingestor
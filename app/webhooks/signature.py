@@ -0,0 +1,64 @@
+import hashlib
+import hmac
+import json
+from dataclasses import dataclass
+
+from fastapi import HTTPException, Request, status
+from prometheus_client import Counter
+
+from app.config.settings import settings
+
+WEBHOOK_SIGNATURE_REJECTED = Counter(
+    "webhook_signature_rejected_total", "Вебхуки с отсутствующей или неверной подписью"
+)
+
+
+class WebhookSignatureVerifier:
+    """
+    Проверка подписи вебхуков PayAdmit: HMAC-SHA256 от сырого тела запроса.
+    Ключ HMAC подготавливается один раз, на каждый запрос делается только copy().
+    """
+
+    def __init__(self, key: str):
+        self._hmac = hmac.new(key.encode(), digestmod=hashlib.sha256)
+
+    def is_valid(self, body: bytes, signature: str) -> bool:
+        mac = self._hmac.copy()
+        mac.update(body)
+        return hmac.compare_digest(
+            mac.hexdigest().encode(), signature.lower().encode("latin-1")
+        )
+
+
+webhook_verifier = WebhookSignatureVerifier(settings.PAYADMIT_SIGN_KEY)
+
+
+@dataclass(slots=True)
+class VerifiedWebhook:
+    data: dict
+    digest: str
+
+
+async def verified_webhook_payload(request: Request) -> VerifiedWebhook:
+    """
+    Dependency: читает тело вебхука один раз, проверяет подпись из заголовка
+    Signature и только после этого разбирает JSON.
+    digest (SHA-256 тела) служит для дедупликации повторных доставок.
+    """
+    body = await request.body()
+    if settings.WEBHOOKS.verify_signature:
+        signature = request.headers.get("Signature")
+        if not signature or not webhook_verifier.is_valid(body, signature):
+            WEBHOOK_SIGNATURE_REJECTED.inc()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid signature"
+            )
+    try:
+        data = json.loads(body)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid payload"
+        )
+    return VerifiedWebhook(data=data, digest=hashlib.sha256(body).hexdigest())
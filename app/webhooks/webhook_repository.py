@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.webhooks.models import WebhookEvent
+
+
+class WebhookEventRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def record_events(
+        self, events: list[tuple[str, str, str]]
+    ) -> set[tuple[str, str, str]]:
+        """
+        Сохраняет пачку событий вебхуков, пропуская уже записанные.
+        Транзакцию не фиксирует: вызывающий код коммитит её вместе с обновлением платежей.
+        :param events: Список ключей (payment_id, state, digest).
+        :return: Ключи событий, которые были записаны впервые.
+        """
+        if not events:
+            return set()
+        received_at = datetime.now(timezone.utc)
+        query = (
+            insert(WebhookEvent)
+            .values(
+                [
+                    {
+                        "payment_id": payment_id,
+                        "state": state,
+                        "digest": digest,
+                        "received_at": received_at,
+                    }
+                    for payment_id, state, digest in events
+                ]
+            )
+            .on_conflict_do_nothing(constraint="uq_webhook_events_payment_state")
+            .returning(WebhookEvent.payment_id, WebhookEvent.state, WebhookEvent.digest)
+        )
+        result = await self.session.execute(query)
+        return {tuple(row) for row in result.all()}
@@ -1,12 +1,84 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from prometheus_client import REGISTRY
 
 from app.api import router as api_router
+from app.auth.key_store import key_store
+from app.config.settings import settings
+from app.db.redis import create_redis
+from app.idempotency.service import create_idempotency_service
+from app.observability.logs import configure_logging
+from app.observability.middleware import MetricsMiddleware
+from app.payments.cache import ResponseCache
+from app.payments.client import PayAdmitClient, PayAdmitPoolCollector
+from app.payments.reconciler import Reconciler
+from app.payments.status_batcher import StatusBatcher
+from app.payments.status_broker import StatusBroker
+from app.ratelimit.service import create_rate_limiter
+from app.tasks.handlers import HANDLERS
+from app.tasks.queue import create_task_queue
+from app.users.utils import password_hasher
+from app.webhooks.ingestion import WebhookIngestor
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Создаёт общие для процесса ресурсы при старте и освобождает их при остановке."""
+    log_listener = configure_logging()
+    key_store.reload()
+    app.state.redis = create_redis()
+    app.state.payadmit_client = PayAdmitClient(redis=app.state.redis)
+    pool_collector = PayAdmitPoolCollector(app.state.payadmit_client)
+    REGISTRY.register(pool_collector)
+    app.state.idempotency = create_idempotency_service(app.state.redis)
+    app.state.rate_limiter = create_rate_limiter(app.state.redis)
+    app.state.payadmit_cache = ResponseCache(settings.PAYADMIT_CACHE, app.state.redis)
+    app.state.status_batcher = StatusBatcher(
+        app.state.payadmit_client, app.state.payadmit_cache
+    )
+    app.state.status_broker = StatusBroker(settings.STATUS_STREAM, app.state.redis)
+    app.state.status_broker.start()
+    app.state.task_queue = create_task_queue(HANDLERS)
+    await app.state.task_queue.start()
+    # Очередь в памяти не надёжнее прямой записи — статусы пишет сам ingestor.
+    app.state.webhook_ingestor = WebhookIngestor(
+        task_queue=app.state.task_queue if app.state.task_queue.durable else None
+    )
+    app.state.webhook_ingestor.start()
+    reconciler = None
+    if settings.RECONCILER.enabled:
+        reconciler = Reconciler(
+            app.state.payadmit_client,
+            cache=app.state.payadmit_cache,
+            broker=app.state.status_broker,
+        )
+        reconciler.start()
+    try:
+        yield
+    finally:
+        if reconciler is not None:
+            await reconciler.stop()
+        await app.state.webhook_ingestor.stop()
+        await app.state.task_queue.stop()
+        await app.state.status_broker.stop()
+        await app.state.status_batcher.stop()
+        REGISTRY.unregister(pool_collector)
+        await app.state.payadmit_client.aclose()
+        if app.state.redis is not None:
+            await app.state.redis.aclose()
+        password_hasher.shutdown()
+        log_listener.stop()
+
 
 app = FastAPI(
     title="Payment platform",
     summary="Платформа предоставляющая удобный способ взаимодействия с партнёрским API.",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 app.include_router(api_router)
@@ -18,6 +90,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/")
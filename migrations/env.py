@@ -9,7 +9,9 @@ from app.db.database import Base
 
 
 from app.users.models import User
-from app.payments.models import Payment
+from app.payments.models import Payment, ReconciliationCheckpoint
+from app.webhooks.models import WebhookEvent
+from app.idempotency.models import IdempotencyRecord
 import app.db.relationship
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,68 @@
+import asyncio
+import contextlib
+import os
+
+import httpx
+import pytest
+
+# Settings() создаётся при импорте app.config.settings и требует этих переменных.
+for name, value in {
+    "PAYADMIT_API_URL": "http://payadmit.test",
+    "PAYADMIT_SIGN_KEY": "payadmit-sign-key",
+    "WEBHOOK_URL": "http://platform.test/webhooks",
+    "API_KEY": "api-key",
+    "SIGN_KEY": "sign-key",
+    "DB_HOST": "127.0.0.1",
+    "DB_PORT": "5432",
+    "DB_USER": "test",
+    "DB_PASS": "test",
+    "DB_NAME": "test",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+class PayAdmit:
+    """Клиент PayAdmit, отвечающий из словаря статусов; неизвестный ID — 404."""
+
+    def __init__(self, states: dict[str, str]):
+        self.states = states
+        self.requests: list[str] = []
+
+    async def request(self, operation, method, url, **kwargs) -> httpx.Response:
+        payment_id = url.rsplit("/", 1)[-1]
+        self.requests.append(payment_id)
+        await asyncio.sleep(0)
+        if payment_id not in self.states:
+            return httpx.Response(404, json={"error": "Payment not found"})
+        return httpx.Response(
+            200, json={"result": {"id": payment_id, "state": self.states[payment_id]}}
+        )
+
+
+class Ledger:
+    """
+    Фабрика сессий поверх списка платежей: сессия — сам Ledger.
+    Фейковые PaymentRepository в тестах пишут сюда позиции сверки и статусы.
+    """
+
+    def __init__(self, payments: list, checkpoint: int = 0):
+        self.payments = payments
+        self.checkpoints = [checkpoint]
+        self.updates: dict[str, str] = {}
+
+    @contextlib.asynccontextmanager
+    async def __call__(self):
+        yield self
+
+
+@pytest.fixture
+def make_payadmit() -> type[PayAdmit]:
+    """Фабрика фейкового клиента PayAdmit: make_payadmit({"id": "STATE"})."""
+    return PayAdmit
+
+
+@pytest.fixture
+def make_ledger() -> type[Ledger]:
+    """Фейковая фабрика сессий: make_ledger([платежи])."""
+    return Ledger
@@ -0,0 +1,71 @@
+import asyncio
+import contextlib
+from decimal import Decimal
+from types import SimpleNamespace
+
+import orjson
+
+from app.config.settings import BulkPayoutSettings
+from app.payments import bulk_payouts
+from app.payments.bulk_payouts import BulkPayoutService
+from app.payments.schemas import CreatePaymentRequest, Customer
+
+USER = SimpleNamespace(id=1, email="user@example.com")
+
+
+class PayAdmit:
+    def __init__(self):
+        self.created = 0
+
+    async def create_payout(self, user, amount, currency, *args, record=True):
+        self.created += 1
+        await asyncio.sleep(0)
+        return {"result": {"id": f"p{self.created}", "state": "PENDING"}}
+
+
+@contextlib.asynccontextmanager
+async def unreachable_database():
+    raise ConnectionRefusedError("connection refused")
+    yield
+
+
+def make_service(payadmit: PayAdmit) -> BulkPayoutService:
+    service = BulkPayoutService(payadmit)
+    service.config = BulkPayoutSettings(concurrency=2, insert_batch_size=1)
+    service.session_factory = unreachable_database
+    return service
+
+
+PAYOUTS = [
+    CreatePaymentRequest(
+        amount=Decimal(i + 1),
+        currency="EUR",
+        customer=Customer(firstName="A", lastName="B"),
+    )
+    for i in range(3)
+]
+
+
+async def test_stream_completes_when_database_is_unreachable():
+    payadmit = PayAdmit()
+
+    lines = [
+        orjson.loads(line)
+        async for line in make_service(payadmit).stream(USER, PAYOUTS)
+    ]
+
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+    assert all("payment_id" in line for line in lines)
+
+
+async def test_drain_survives_unreachable_database():
+    payadmit = PayAdmit()
+    stream = make_service(payadmit).stream(USER, PAYOUTS)
+
+    await anext(stream)
+    await stream.aclose()
+    drains = list(bulk_payouts._drains)
+    results = await asyncio.gather(*drains, return_exceptions=True)
+
+    assert results and results == [None] * len(drains)
+    assert payadmit.created == 3
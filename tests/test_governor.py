@@ -0,0 +1,102 @@
+import pytest
+from fakeredis import FakeAsyncRedis
+
+from app.config.settings import PayAdmitGovernorSettings
+from app.payments import governor
+from app.payments.governor import (
+    LocalGovernorState,
+    RedisGovernorState,
+    parse_retry_after,
+)
+
+CONFIG = PayAdmitGovernorSettings(
+    max_rate=10, priority_reserve=0.2, decrease_factor=0.5, decrease_cooldown=1
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(governor, "time", clock)
+    return clock
+
+
+async def drain(state, priority: bool) -> int:
+    allowed = 0
+    while (await state.acquire(priority))[0] == 0:
+        allowed += 1
+    return allowed
+
+
+async def test_normal_calls_leave_priority_reserve(clock):
+    state = LocalGovernorState(CONFIG)
+
+    assert await drain(state, priority=False) == 8
+    assert await state.acquire(False) == (pytest.approx(0.1), 10)
+    assert await drain(state, priority=True) == 2
+    assert await state.acquire(True) == (pytest.approx(0.1), 10)
+
+
+async def test_bucket_refills_at_current_rate(clock):
+    state = LocalGovernorState(CONFIG)
+    await drain(state, priority=True)
+
+    clock.now += 0.5
+
+    assert await drain(state, priority=True) == 5
+
+
+async def test_throttle_halves_rate_and_pauses(clock):
+    state = LocalGovernorState(CONFIG)
+
+    assert await state.throttle(2.0) == 5
+    assert await state.acquire(True) == (pytest.approx(2.0), 5)
+
+    clock.now += 2.0
+    # Бакет после паузы пуст и наполняется по сниженному лимиту.
+    assert await state.acquire(True) == (pytest.approx(0.2), 5)
+
+
+async def test_throttle_decreases_once_per_cooldown(clock):
+    state = LocalGovernorState(CONFIG)
+
+    assert await state.throttle(0) == 5
+    assert await state.throttle(0) == 5
+    clock.now += 1.0
+    assert await state.throttle(0) == pytest.approx(3.0)
+
+
+async def test_rate_recovers_linearly_to_quota(clock):
+    state = LocalGovernorState(CONFIG)
+    await state.throttle(0)
+
+    clock.now += 2.0
+    assert (await state.acquire(True))[1] == pytest.approx(7)
+    clock.now += 60.0
+    assert (await state.acquire(True))[1] == 10
+
+
+async def test_redis_state_keeps_priority_reserve():
+    state = RedisGovernorState(FakeAsyncRedis(), CONFIG)
+
+    assert await drain(state, priority=False) == 8
+    wait, rate = await state.acquire(False)
+    assert 0 < wait <= 0.1
+    assert rate == 10
+    assert await state.throttle(1.0) == 5
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [(None, 0), ("", 0), ("3", 3), ("-1", 0), ("Wed, 21 Oct 2015 07:28:00 GMT", 0)],
+)
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value) == expected
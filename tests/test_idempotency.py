@@ -0,0 +1,232 @@
+import asyncio
+from decimal import Decimal
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from app.config.settings import IdempotencySettings
+from app.idempotency.models import IdempotencyRecord
+from app.idempotency.service import IdempotencyService
+from app.idempotency.stores import MemoryIdempotencyStore, StoredResponse
+from app.payments.client import PayAdmitClient
+from app.payments.payments_service import PayAdmitService
+from app.payments.resilience import PayAdmitRejected
+from app.payments.schemas import Customer
+
+
+class Payload(BaseModel):
+    amount: int
+
+
+class FailingCompleteStore(MemoryIdempotencyStore):
+    async def complete(self, key, fingerprint, body):
+        raise ConnectionError("store is down")
+
+
+@pytest.fixture
+def service() -> IdempotencyService:
+    return IdempotencyService(MemoryIdempotencyStore(IdempotencySettings()))
+
+
+async def test_repeated_key_replays_stored_response(service):
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        return {"id": calls}
+
+    first = await service.execute("key", "payment:1", Payload(amount=10), call)
+    second = await service.execute("key", "payment:1", Payload(amount=10), call)
+
+    assert first == second == {"id": 1}
+    assert calls == 1
+
+
+async def test_concurrent_duplicates_share_one_call(service):
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"id": calls}
+
+    results = await asyncio.gather(
+        *(
+            service.execute("key", "payment:1", Payload(amount=10), call)
+            for _ in range(5)
+        )
+    )
+
+    assert results == [{"id": 1}] * 5
+    assert calls == 1
+
+
+async def test_key_reused_with_other_body_is_rejected(service):
+    async def call():
+        return {}
+
+    await service.execute("key", "payment:1", Payload(amount=10), call)
+    with pytest.raises(HTTPException) as error:
+        await service.execute("key", "payment:1", Payload(amount=20), call)
+
+    assert error.value.status_code == 422
+
+
+async def test_call_rejected_before_sending_releases_key(service):
+    async def rejected():
+        raise PayAdmitRejected(status_code=503, detail="breaker open")
+
+    async def succeeding():
+        return {"ok": True}
+
+    with pytest.raises(PayAdmitRejected):
+        await service.execute("key", "payment:1", Payload(amount=10), rejected)
+
+    assert await service.execute(
+        "key", "payment:1", Payload(amount=10), succeeding
+    ) == {"ok": True}
+
+
+async def test_call_with_unknown_outcome_keeps_key_reserved():
+    store = MemoryIdempotencyStore(IdempotencySettings(lock_ttl=0))
+    service = IdempotencyService(store)
+    calls = 0
+
+    async def timed_out():
+        nonlocal calls
+        calls += 1
+        raise HTTPException(status_code=504)
+
+    with pytest.raises(HTTPException):
+        await service.execute("key", "payment:1", Payload(amount=10), timed_out)
+    # Даже после lock_ttl ключ держится unknown_outcome_ttl.
+    with pytest.raises(HTTPException) as error:
+        await service.execute("key", "payment:1", Payload(amount=10), timed_out)
+
+    assert error.value.status_code == 409
+    assert calls == 1
+
+
+async def test_long_key_fits_store_column(service):
+    async def call():
+        return {}
+
+    key = "k" * 255
+    await service.execute(key, "payout:123456789", Payload(amount=10), call)
+
+    (store_key,) = service.store._records
+    assert len(store_key) <= IdempotencyRecord.__table__.c.key.type.length
+    assert key not in store_key
+
+
+async def test_complete_failure_keeps_key_reserved():
+    service = IdempotencyService(FailingCompleteStore(IdempotencySettings()))
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        return {"id": calls}
+
+    assert await service.execute("key", "payment:1", Payload(amount=10), call) == {
+        "id": 1
+    }
+    with pytest.raises(HTTPException) as error:
+        await service.execute("key", "payment:1", Payload(amount=10), call)
+
+    assert error.value.status_code == 409
+    assert calls == 1
+
+
+async def test_lock_ttl_overrides_default_lock():
+    store = MemoryIdempotencyStore(IdempotencySettings(lock_ttl=0))
+
+    assert await store.reserve("short", "fingerprint") is None
+    assert await store.reserve("short", "fingerprint") is None
+    assert await store.reserve("long", "fingerprint", lock_ttl=60) is None
+    assert await store.reserve("long", "fingerprint") == StoredResponse(
+        "fingerprint", None
+    )
+
+
+def payadmit_service(handler) -> PayAdmitService:
+    client = PayAdmitClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return PayAdmitService(client, cache=None, payments=None)
+
+
+async def create_payment(service, payadmit):
+    user = SimpleNamespace(id=1, email="user@example.com")
+    payload = Payload(amount=10)
+    return await service.execute(
+        "key",
+        "create_payment:1",
+        payload,
+        lambda: payadmit.create_payment(
+            user, Decimal(10), "EUR", Customer(firstName="A", lastName="B")
+        ),
+    )
+
+
+async def test_retry_after_read_timeout_does_not_post_again(service):
+    posts = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal posts
+        posts += 1
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    payadmit = payadmit_service(handler)
+
+    with pytest.raises(HTTPException) as first:
+        await create_payment(service, payadmit)
+    with pytest.raises(HTTPException) as second:
+        await create_payment(service, payadmit)
+
+    assert (first.value.status_code, second.value.status_code) == (504, 409)
+    assert posts == 1
+
+
+async def test_retry_after_connect_error_posts_again(service):
+    posts = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal posts
+        posts += 1
+        if posts == 1:
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(200, json={"result": {"id": "p1", "state": "CHECKOUT"}})
+
+    payadmit = payadmit_service(handler)
+
+    with pytest.raises(PayAdmitRejected):
+        await create_payment(service, payadmit)
+    result = await create_payment(service, payadmit)
+
+    assert result["payment_id"] == "p1"
+    assert posts == 2
+
+
+@pytest.mark.parametrize(
+    ("status_code", "retried"), [(429, True), (500, False), (503, False)]
+)
+async def test_payadmit_error_responses_are_not_stored(service, status_code, retried):
+    posts = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal posts
+        posts += 1
+        return httpx.Response(status_code, json={"error": "unavailable"})
+
+    payadmit = payadmit_service(handler)
+
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            await create_payment(service, payadmit)
+
+    assert posts == (2 if retried else 1)
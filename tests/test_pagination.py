@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.payments.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+    cursor = encode_cursor(created_at, 42)
+
+    assert decode_cursor(cursor) == (created_at, 42)
+    assert "=" not in cursor
+
+
+def test_cursor_keeps_timezone():
+    created_at = datetime(2025, 3, 1, 15, 0, tzinfo=timezone(timedelta(hours=3)))
+
+    decoded, _ = decode_cursor(encode_cursor(created_at, 1))
+
+    assert decoded.utcoffset() == timedelta(hours=3)
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "WzFd", "eyJhIjoxfQ"])
+def test_damaged_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
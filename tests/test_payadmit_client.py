@@ -0,0 +1,28 @@
+import httpcore
+import httpx
+
+from app.payments.client import PayAdmitClient
+
+
+def test_pool_internals_match_installed_httpcore():
+    # pool_stats читает внутренние атрибуты httpx/httpcore; при обновлении
+    # зависимостей этот тест показывает, что их нужно перепроверить.
+    client = PayAdmitClient()
+    pool = client._client._transport._pool
+
+    assert isinstance(pool, httpcore.AsyncConnectionPool)
+    assert isinstance(pool.connections, list)
+    assert isinstance(pool._requests, list)
+    assert callable(getattr(httpcore.AsyncConnectionPool, "connections").fget)
+    assert callable(httpcore.AsyncHTTPConnection.is_idle)
+    assert callable(httpcore._async.connection_pool.AsyncPoolRequest.is_queued)
+    assert client.pool_stats() == {"active": 0, "idle": 0, "queued": 0}
+
+
+def test_pool_stats_without_pool_internals():
+    client = PayAdmitClient()
+    client._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200))
+    )
+
+    assert client.pool_stats() == {"active": 0, "idle": 0, "queued": 0}
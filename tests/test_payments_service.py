@@ -0,0 +1,77 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.payments.client import PayAdmitClient
+from app.payments.payments_service import PayAdmitService
+from app.payments.schemas import Customer
+
+USER = SimpleNamespace(id=1, email="user@example.com")
+CUSTOMER = Customer(firstName="A", lastName="B")
+
+
+class UnreachableDatabase:
+    """Репозиторий, у которого БД недоступна: asyncpg отдаёт голый OSError."""
+
+    def __init__(self):
+        self.session = self
+
+    async def create_payment(self, **values):
+        raise ConnectionRefusedError("connection refused")
+
+    async def rollback(self):
+        raise ConnectionRefusedError("connection refused")
+
+
+def make_service(handler, payments=None) -> PayAdmitService:
+    client = PayAdmitClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return PayAdmitService(client, cache=None, payments=payments)
+
+
+def created(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={"result": {"id": "p1", "state": "CHECKOUT"}})
+
+
+async def test_created_payment_survives_unreachable_database():
+    service = make_service(created, UnreachableDatabase())
+
+    result = await service.create_payment(USER, Decimal(10), "EUR", CUSTOMER)
+
+    assert result["payment_id"] == "p1"
+    assert result["status"] == "CHECKOUT"
+
+
+@pytest.mark.parametrize("method", ["create_payout", "create_refund"])
+async def test_other_operations_survive_unreachable_database(method):
+    service = make_service(created, UnreachableDatabase())
+    args = (CUSTOMER,) if method == "create_payout" else ("parent",)
+
+    result = await getattr(service, method)(USER, Decimal(10), "EUR", *args)
+
+    assert result["result"]["id"] == "p1"
+
+
+@pytest.mark.parametrize(
+    ("body", "payment_id", "state"),
+    [
+        ({"result": {"id": 123, "state": "CHECKOUT"}}, "123", "CHECKOUT"),
+        ({"result": {"id": "p1", "state": None}}, "p1", None),
+        ({"result": {"id": "p1"}}, "p1", None),
+    ],
+)
+async def test_lax_creation_response_is_accepted(body, payment_id, state):
+    service = make_service(lambda request: httpx.Response(200, json=body))
+
+    result = await service.create_payment(USER, Decimal(10), "EUR", CUSTOMER)
+
+    assert (result["payment_id"], result["status"]) == (payment_id, state)
+
+
+async def test_unparsable_creation_response_is_returned_as_is():
+    body = {"result": {"state": "CHECKOUT"}, "note": "no id"}
+    service = make_service(lambda request: httpx.Response(200, json=body))
+
+    assert await service.create_payment(USER, Decimal(10), "EUR", CUSTOMER) == body
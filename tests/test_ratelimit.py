@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import pytest
+from fakeredis import FakeAsyncRedis
+from fastapi import HTTPException
+
+from app.config.settings import RateLimitRule, RateLimitSettings
+from app.ratelimit.limiters import MemorySlidingWindowLimiter, RedisGCRALimiter
+from app.ratelimit.service import RateLimiter, enforce_rate_limit
+
+RULE = RateLimitRule(limit=3, period=60)
+
+
+@pytest.fixture
+def redis():
+    return FakeAsyncRedis()
+
+
+async def test_memory_window_rejects_over_limit():
+    limiter = MemorySlidingWindowLimiter()
+
+    decisions = [limiter.hit("1:create", RULE) for _ in range(4)]
+
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert [d.remaining for d in decisions[:3]] == [2, 1, 0]
+    assert 0 < decisions[-1].retry_after <= 2 * RULE.period
+    assert decisions[-1].headers()["Retry-After"]
+
+
+async def test_memory_window_keys_are_independent():
+    limiter = MemorySlidingWindowLimiter()
+
+    for _ in range(3):
+        limiter.hit("1:create", RULE)
+
+    assert not limiter.hit("1:create", RULE).allowed
+    assert limiter.hit("2:create", RULE).allowed
+    assert limiter.hit("1:read", RULE).allowed
+
+
+async def test_memory_window_charges_cost():
+    limiter = MemorySlidingWindowLimiter()
+
+    assert limiter.hit("1:bulk", RULE, cost=2).remaining == 1
+    assert not limiter.hit("1:bulk", RULE, cost=2).allowed
+    assert limiter.hit("1:bulk", RULE, cost=1).allowed
+
+
+async def test_gcra_allows_burst_then_rejects(redis):
+    limiter = RedisGCRALimiter(redis)
+
+    decisions = [await limiter.hit("1:create", RULE) for _ in range(4)]
+
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert [d.remaining for d in decisions[:3]] == [2, 1, 0]
+    # Следующий запрос разрешён через интервал period / limit.
+    assert decisions[-1].retry_after == pytest.approx(RULE.period / RULE.limit, 0.1)
+
+
+async def test_gcra_burst_limits_consecutive_requests(redis):
+    limiter = RedisGCRALimiter(redis)
+    rule = RateLimitRule(limit=3, period=60, burst=1)
+
+    assert (await limiter.hit("1:create", rule)).allowed
+    assert not (await limiter.hit("1:create", rule)).allowed
+
+
+async def test_gcra_charges_cost(redis):
+    limiter = RedisGCRALimiter(redis)
+
+    assert (await limiter.hit("1:bulk", RULE, cost=2)).allowed
+    rejected = await limiter.hit("1:bulk", RULE, cost=2)
+    assert not rejected.allowed
+    assert (await limiter.hit("1:bulk", RULE, cost=1)).allowed
+    assert rejected.retry_after == pytest.approx(RULE.period / RULE.limit, 0.1)
+
+
+async def test_cost_above_capacity_is_rejected_without_charging():
+    limiter = RateLimiter(RateLimitSettings(rules={"bulk": RULE}))
+    request = SimpleNamespace(state=SimpleNamespace())
+    user = SimpleNamespace(id=1)
+
+    with pytest.raises(HTTPException) as error:
+        await enforce_rate_limit(request, limiter, user, "bulk", cost=4)
+
+    assert error.value.status_code == 413
+    assert "3" in error.value.detail
+    await enforce_rate_limit(request, limiter, user, "bulk", cost=3)
+    assert request.state.rate_limit.remaining == 0
@@ -0,0 +1,147 @@
+import contextlib
+
+import pytest
+
+from app.config.settings import ReconcilerSettings, StatusStreamSettings
+from app.payments import reconciler
+from app.payments.reconciler import Reconciler
+from app.payments.status_broker import StatusBroker, StatusEvent
+
+
+class StoredPayment:
+    """Строка payments, которая, как ORM-объект после rollback, недоступна для чтения."""
+
+    def __init__(self, id: int, external_id: str, status: str):
+        self.values = {"id": id, "external_id": external_id, "status": status}
+        self.expired = False
+
+    def __getattr__(self, name):
+        if self.expired:
+            raise RuntimeError(f"{name} read after the session was released")
+        return self.values[name]
+
+
+class PaymentRepository:
+    def __init__(self, session):
+        self.ledger = session
+
+    async def get_checkpoint(self, name):
+        return self.ledger.checkpoints[-1]
+
+    async def save_checkpoint(self, name, after_id):
+        self.ledger.checkpoints.append(after_id)
+
+    async def get_unsettled_payments(self, after_id, created_before, limit):
+        payments = [p for p in self.ledger.payments if p.values["id"] > after_id]
+        for payment in payments:
+            payment.expired = False
+        return payments[:limit]
+
+    async def bulk_update_statuses(self, statuses):
+        self.ledger.updates.update(statuses)
+
+
+async def release_connection(session):
+    for payment in session.payments:
+        payment.expired = True
+
+
+class LockEngine:
+    def __init__(self, acquired: bool = True):
+        self.acquired = acquired
+
+    @contextlib.asynccontextmanager
+    async def connect(self):
+        yield self
+
+    async def scalar(self, query):
+        return self.acquired
+
+
+class Cache:
+    def __init__(self):
+        self.invalidated: list[str] = []
+
+    async def invalidate_payment(self, payment_id):
+        self.invalidated.append(payment_id)
+
+
+@pytest.fixture(autouse=True)
+def fake_database(monkeypatch):
+    monkeypatch.setattr(reconciler, "PaymentRepository", PaymentRepository)
+    monkeypatch.setattr(reconciler, "release_connection", release_connection)
+
+
+def make_reconciler(ledger, client, cache=None, broker=None, **config) -> Reconciler:
+    return Reconciler(
+        client,
+        ledger,
+        LockEngine(),
+        ReconcilerSettings(rate_limit=1000, **config),
+        cache=cache,
+        broker=broker,
+    )
+
+
+async def test_run_updates_drifted_statuses(make_ledger, make_payadmit):
+    ledger = make_ledger(
+        [
+            StoredPayment(1, "p1", "PENDING"),
+            StoredPayment(2, "p2", "PENDING"),
+            StoredPayment(3, "p3", "PENDING"),
+        ]
+    )
+    client = make_payadmit({"p1": "COMPLETED", "p2": "PENDING"})
+
+    stats = await make_reconciler(ledger, client).run_once()
+
+    assert (stats.checked, stats.drifted, stats.failed) == (2, 1, 1)
+    assert ledger.updates == {"p1": "COMPLETED"}
+    # Проход дошёл до конца, следующий начнётся сначала.
+    assert ledger.checkpoints[-1] == 0
+
+
+async def test_run_saves_position_after_each_batch(make_ledger, make_payadmit):
+    ledger = make_ledger([StoredPayment(i, f"p{i}", "PENDING") for i in range(1, 6)])
+    client = make_payadmit({f"p{i}": "DECLINED" for i in range(1, 6)})
+
+    stats = await make_reconciler(
+        ledger, client, batch_size=2, max_payments_per_run=4
+    ).run_once()
+
+    assert stats.drifted == 4
+    assert ledger.checkpoints == [0, 2, 4]
+
+    stats = await make_reconciler(ledger, client, batch_size=2).run_once()
+
+    assert stats.drifted == 1
+    assert ledger.checkpoints[-1] == 0
+    assert set(ledger.updates) == {f"p{i}" for i in range(1, 6)}
+
+
+async def test_run_is_skipped_while_lock_is_held(make_ledger, make_payadmit):
+    ledger = make_ledger([StoredPayment(1, "p1", "PENDING")])
+    instance = make_reconciler(ledger, make_payadmit({"p1": "COMPLETED"}))
+    instance.lock_engine = LockEngine(acquired=False)
+
+    assert await instance.run_once() is None
+    assert ledger.updates == {}
+
+
+async def test_drift_is_invalidated_and_published(make_ledger, make_payadmit):
+    ledger = make_ledger(
+        [StoredPayment(1, "p1", "PENDING"), StoredPayment(2, "p2", "PENDING")]
+    )
+    cache = Cache()
+    broker = StatusBroker(StatusStreamSettings(use_redis=False))
+
+    with broker.subscribe("p1") as events:
+        await make_reconciler(
+            ledger,
+            make_payadmit({"p1": "COMPLETED", "p2": "PENDING"}),
+            cache=cache,
+            broker=broker,
+        ).run_once()
+
+        assert events.get_nowait() == StatusEvent("p1", "COMPLETED")
+    assert cache.invalidated == ["p1"]
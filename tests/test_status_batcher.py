@@ -0,0 +1,121 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+
+from app.api.payment import router as payment_router
+from app.auth.auth_service import AuthService
+from app.config.settings import RateLimitSettings, StatusBatchSettings
+from app.payments import status_batcher
+from app.payments.models import Payment
+from app.payments.status_batcher import StatusBatcher
+from app.ratelimit.service import RateLimiter
+
+
+@pytest.fixture(autouse=True)
+def ledger_repository(monkeypatch):
+    class PaymentRepository:
+        def __init__(self, session):
+            self.session = session
+
+        async def get_payments_by_external_ids(self, external_ids):
+            return [p for p in self.session.payments if p.external_id in external_ids]
+
+    monkeypatch.setattr(status_batcher, "PaymentRepository", PaymentRepository)
+
+
+@pytest.fixture
+def make_batcher(make_ledger):
+    def make(client, payments: list[Payment] = ()) -> StatusBatcher:
+        return StatusBatcher(
+            client, None, StatusBatchSettings(window=0.001), make_ledger(list(payments))
+        )
+
+    return make
+
+
+async def test_concurrent_requests_for_one_payment_share_a_call(
+    make_payadmit, make_batcher
+):
+    client = make_payadmit({"p1": "CHECKOUT"})
+    batcher = make_batcher(client)
+
+    results = await asyncio.gather(*(batcher.get("p1") for _ in range(10)))
+
+    assert all(r["result"]["state"] == "CHECKOUT" for r in results)
+    assert client.requests == ["p1"]
+    await batcher.stop()
+
+
+async def test_get_many_returns_error_per_payment(make_payadmit, make_batcher):
+    client = make_payadmit({"p1": "CHECKOUT"})
+    batcher = make_batcher(client)
+
+    results = await batcher.get_many(["p1", "missing", "p1"])
+
+    assert list(results) == ["p1", "missing"]
+    assert results["p1"]["result"]["state"] == "CHECKOUT"
+    assert isinstance(results["missing"], HTTPException)
+    assert results["missing"].status_code == 404
+    await batcher.stop()
+
+
+async def test_terminal_status_is_answered_from_ledger(make_payadmit, make_batcher):
+    client = make_payadmit({"p2": "CHECKOUT"})
+    settled = Payment(
+        external_id="p1",
+        payment_type="DEPOSIT",
+        amount=10.0,
+        currency="EUR",
+        status="COMPLETED",
+    )
+    batcher = make_batcher(client, [settled])
+
+    results = await batcher.get_many(["p1", "p2"])
+
+    assert results["p1"]["result"]["state"] == "COMPLETED"
+    assert results["p2"]["result"]["state"] == "CHECKOUT"
+    assert client.requests == ["p2"]
+    await batcher.stop()
+
+
+@pytest.fixture
+async def api(make_payadmit, make_batcher):
+    app = FastAPI()
+    app.include_router(payment_router, prefix="/payments")
+    app.dependency_overrides[AuthService.get_current_user] = lambda: SimpleNamespace(
+        id=1
+    )
+    app.state.rate_limiter = RateLimiter(RateLimitSettings(enabled=False))
+    app.state.status_batcher = make_batcher(make_payadmit({"p1": "CHECKOUT"}))
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        yield client
+    await app.state.status_batcher.stop()
+
+
+async def test_status_endpoint_returns_payadmit_error_body(api):
+    response = await api.get("/payments/payments/status", params={"payment_id": "x"})
+
+    assert response.status_code == 200
+    assert response.json() == {"error": "Payment not found"}
+
+
+async def test_batch_endpoint_reports_payadmit_error_per_id(api):
+    response = await api.post(
+        "/payments/payments/status/batch", json={"payment_ids": ["p1", "x"]}
+    )
+
+    assert response.json()["results"] == [
+        {"payment_id": "p1", "data": {"result": {"id": "p1", "state": "CHECKOUT"}}},
+        {
+            "payment_id": "x",
+            "error": {
+                "status_code": 404,
+                "detail": "Ошибка при проверке статуса платежа",
+            },
+        },
+    ]
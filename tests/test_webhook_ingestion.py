@@ -0,0 +1,109 @@
+import contextlib
+
+import pytest
+
+from app.config.settings import WebhookSettings
+from app.webhooks import ingestion
+from app.webhooks.ingestion import StatusUpdate, WebhookIngestor
+
+
+class Database:
+    """Фабрика сессий, которая запоминает записанные пачки или отказывает."""
+
+    def __init__(self, failures: int = 0, error: type[Exception] = OSError):
+        self.failures = failures
+        self.error = error
+        self.batches: list[list[StatusUpdate]] = []
+
+    @contextlib.asynccontextmanager
+    async def __call__(self):
+        if self.failures:
+            self.failures -= 1
+            raise self.error("database is unavailable")
+        yield self
+
+
+@pytest.fixture(autouse=True)
+def record_writes(monkeypatch):
+    async def write_status_updates(session, batch):
+        session.batches.append(batch)
+
+    monkeypatch.setattr(ingestion, "write_status_updates", write_status_updates)
+
+
+def make_ingestor(database: Database, requeue_limit: int = 5) -> WebhookIngestor:
+    config = WebhookSettings(
+        flush_interval=0.001, flush_retries=1, requeue_limit=requeue_limit
+    )
+    ingestor = WebhookIngestor(database, config)
+    ingestor.start()
+    return ingestor
+
+
+UPDATE = StatusUpdate("payment-1", "COMPLETED", "digest")
+
+
+async def test_duplicate_after_flush_is_dropped():
+    database = Database()
+    ingestor = make_ingestor(database)
+
+    assert await ingestor.submit(UPDATE)
+    await ingestor.queue.join()
+    assert not await ingestor.submit(UPDATE)
+
+    await ingestor.stop()
+    assert database.batches == [[UPDATE]]
+
+
+async def test_failed_batch_is_requeued():
+    database = Database(failures=2)
+    ingestor = make_ingestor(database)
+
+    assert await ingestor.submit(UPDATE)
+    await ingestor.queue.join()
+    assert not await ingestor.submit(UPDATE)
+
+    await ingestor.stop()
+    assert database.batches == [[UPDATE]]
+
+
+async def test_unexpected_error_does_not_stop_consumer():
+    database = Database(failures=1, error=RuntimeError)
+    ingestor = make_ingestor(database)
+
+    assert await ingestor.submit(UPDATE)
+    await ingestor.queue.join()
+
+    assert not ingestor._task.done()
+    await ingestor.stop()
+    assert database.batches == [[UPDATE]]
+
+
+async def test_redelivery_of_dropped_update_is_accepted():
+    database = Database(failures=1)
+    ingestor = make_ingestor(database, requeue_limit=0)
+
+    assert await ingestor.submit(UPDATE)
+    await ingestor.queue.join()
+    assert await ingestor.submit(UPDATE)
+
+    await ingestor.stop()
+    assert database.batches == [[UPDATE]]
+
+
+async def test_requeue_skips_update_superseded_by_newer_status():
+    database = Database()
+    ingestor = WebhookIngestor(database, WebhookSettings(flush_interval=0.001))
+    older = StatusUpdate("payment-1", "PROCESSING", "older")
+    newer = StatusUpdate("payment-1", "COMPLETED", "newer")
+
+    # Новый статус пришёл, пока пачка со старым записывалась и не записалась.
+    assert await ingestor.submit(older)
+    batch = [ingestor.queue.get_nowait()]
+    assert await ingestor.submit(newer)
+    ingestor._requeue(batch)
+    ingestor.queue.task_done()
+
+    ingestor.start()
+    await ingestor.stop()
+    assert database.batches == [[newer]]
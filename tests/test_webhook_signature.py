@@ -0,0 +1,79 @@
+import hashlib
+import hmac
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+
+from app.config.settings import settings
+from app.webhooks.signature import (
+    VerifiedWebhook,
+    WebhookSignatureVerifier,
+    verified_webhook_payload,
+)
+
+BODY = b'{"id": "p1", "state": "COMPLETED"}'
+
+
+def sign(body: bytes, key: str = settings.PAYADMIT_SIGN_KEY) -> str:
+    return hmac.new(key.encode(), body, hashlib.sha256).hexdigest()
+
+
+def test_verifier_accepts_signature_in_any_case():
+    verifier = WebhookSignatureVerifier("secret")
+
+    assert verifier.is_valid(BODY, sign(BODY, "secret"))
+    assert verifier.is_valid(BODY, sign(BODY, "secret").upper())
+
+
+def test_verifier_rejects_other_key_or_body():
+    verifier = WebhookSignatureVerifier("secret")
+
+    assert not verifier.is_valid(BODY, sign(BODY, "other"))
+    assert not verifier.is_valid(BODY + b" ", sign(BODY, "secret"))
+    assert not verifier.is_valid(BODY, "not-a-hex-digest")
+
+
+@pytest.fixture
+async def client():
+    app = FastAPI()
+
+    @app.post("/webhook")
+    async def webhook(payload: VerifiedWebhook = Depends(verified_webhook_payload)):
+        return {"data": payload.data, "digest": payload.digest}
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        yield client
+
+
+async def test_signed_webhook_is_parsed(client):
+    response = await client.post(
+        "/webhook", content=BODY, headers={"Signature": sign(BODY)}
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "data": {"id": "p1", "state": "COMPLETED"},
+        "digest": hashlib.sha256(BODY).hexdigest(),
+    }
+
+
+@pytest.mark.parametrize(
+    "headers", [{}, {"Signature": "0" * 64}, {"Signature": sign(b"{}")}]
+)
+async def test_unsigned_or_forged_webhook_is_rejected(client, headers):
+    response = await client.post("/webhook", content=BODY, headers=headers)
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid signature"}
+
+
+async def test_signed_non_object_payload_is_rejected(client):
+    response = await client.post(
+        "/webhook", content=b"[1]", headers={"Signature": sign(b"[1]")}
+    )
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid payload"}